@@ -1,14 +1,28 @@
-import os, sqlite3, random
-from fastapi import FastAPI, HTTPException
+import os, re, time, base64, sqlite3, random, json, threading, logging, mimetypes, gzip, zlib, html
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from email.utils import formatdate
+from functools import lru_cache
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 import atexit
 from apscheduler.schedulers.background import BackgroundScheduler
-from typing import Optional
+from typing import List, Optional
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
 
 # Shared feed utilities
-from feeds import refresh_feeds
-from local_files import refresh_local_files, get_file_by_hash
+from local_files import get_file_by_hash
+from previews import can_preview, get_cache as get_preview_cache, render_later
+from snapshot import MANIFEST, export_snapshot, open_snapshot, read_manifest
+from sources import SourceRun, load_sources, run_source
+import metrics
+from db import ARTICLE_COLUMNS, KIND_LOCAL_FILE, KIND_RSS, PER_SOURCE_SQL, reader
 
 app = FastAPI(root_path="/api/latest")
 
@@ -21,11 +35,249 @@ app.add_middleware(
 )
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "..", "content.db")
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", os.path.join(os.path.dirname(__file__), "..", "snapshots"))
+
+
+@app.middleware("http")
+async def _record_latency(request: Request, call_next):
+    # Labelled by route template (e.g. /files/{file_hash}) to keep series few;
+    # streamed bodies are timed until their headers go out.
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - started,
+        route=getattr(route, "path", "unmatched"), method=request.method,
+        status=response.status_code,
+    )
+    return response
+
+# ---------------------------------------------------------------------------
+# Response cache for latest(), invalidated by the refresh generation
+# ---------------------------------------------------------------------------
+# The data only changes when a refresh commits, so responses are cached as
+# ready-to-send JSON bytes. Each (limit, per_source) key keeps its rows plus
+# up to CACHE_VARIANTS differently shuffled renderings (per content encoding);
+# the shuffle is seeded with (generation, variant) so a cached variant never
+# needs recomputing. Writes by other processes (cron runs of feeder.py,
+# scan_files.py, import_onebird.py) are noticed by `_check_external_writes`.
+
+CACHE_VARIANTS = 8
+CACHE_MAX_KEYS = 32
+
+_generation = 0
+_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _bump_generation():
+    """Invalidate every cached latest() response and file lookup."""
+    global _generation
+    with _cache_lock:
+        _generation += 1
+        _cache.clear()
+        _refresh_status["generation"] = _generation
+    _file_info.cache_clear()
+
+
+_files_key = None
+
+
+def _check_external_writes():
+    """Bump the generation if content.db or the snapshot changed on disk.
+
+    Three stats per request: a commit from any process grows the -wal file
+    (or, after a checkpoint, rewrites the main file), and an export
+    replaces the manifest.
+    """
+    global _files_key
+    key = []
+    for path in (DB_PATH, DB_PATH + "-wal", os.path.join(SNAPSHOT_DIR, MANIFEST)):
+        try:
+            st = os.stat(path)
+        except OSError:
+            key.append(None)
+            continue
+        key.append((st.st_ino, st.st_mtime_ns, st.st_size))
+    key = tuple(key)
+    with _cache_lock:
+        if key == _files_key:
+            return
+        seen, _files_key = _files_key is not None, key
+    if seen:
+        _bump_generation()
+
+
+def _serialize(items: list) -> bytes:
+    # Same settings as FastAPI's JSONResponse
+    return json.dumps(items, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":"), default=str).encode("utf-8")
+
+# ---------------------------------------------------------------------------
+# Response compression (Accept-Encoding) and streamed bodies
+# ---------------------------------------------------------------------------
+# Brotli is optional: `pip install brotli` to offer it, gzip is always there.
+
+STREAM_BATCH = 200            # rows fetched (and flushed to the client) at a time
+COMPRESS_MIN_BYTES = 1024     # smaller bodies aren't worth compressing
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5            # a good speed/size point for dynamic responses
+
+
+def _negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick "br", "gzip" or None (identity) from an Accept-Encoding header."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    for encoding in (("br", "gzip") if brotli else ("gzip",)):
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+class _Compressor:
+    """Incremental encoder with the same interface for gzip and brotli."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._gz = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 → gzip header
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compress *data* and flush it so the client can decode it right away."""
+        if self.encoding == "br":
+            return self._br.process(data) + self._br.flush()
+        return self._gz.compress(data) + self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._br.finish()
+        return self._gz.flush()
 
-# refresh_feeds imported from feeds module; we'll wrap a convenience lambda with DB_PATH applied.
-def _refresh_feeds_wrapper():
-    refresh_feeds(DB_PATH)
-    refresh_local_files(DB_PATH)
+
+def _compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding is None:
+        return body
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, GZIP_LEVEL)
+
+
+def _encode_stream(chunks, encoding: Optional[str]):
+    """Pass byte chunks through, compressing each one if *encoding* is set."""
+    if encoding is None:
+        yield from chunks
+        return
+    compressor = _Compressor(encoding)
+    for data in chunks:
+        out = compressor.chunk(data)
+        if out:
+            yield out
+    yield compressor.finish()
+
+
+def _json_chunks(rows, ndjson: bool):
+    """Serialize rows as NDJSON lines or one JSON array, STREAM_BATCH per chunk."""
+    buf = [] if ndjson else [b"["]
+    first = True
+    for row in rows:
+        line = _serialize(row)
+        if ndjson:
+            buf.append(line + b"\n")
+        else:
+            buf.append(line if first else b"," + line)
+        first = False
+        if len(buf) >= STREAM_BATCH:
+            yield b"".join(buf)
+            buf = []
+    if not ndjson:
+        buf.append(b"]")
+    if buf:
+        yield b"".join(buf)
+
+# ---------------------------------------------------------------------------
+# Refresh jobs – one per source (see sources.py), off the request path
+# ---------------------------------------------------------------------------
+# Every source runs on its own interval and thread, at most once at a time,
+# so a slow disk scan never holds up RSS and one failing source never stops
+# another. Each finished run bumps the cache generation.
+
+SOURCES = [s for s in load_sources() if s.enabled]
+
+_refresh_status = {
+    "generation": 0,
+    "sources": {
+        s.name: {
+            "type": s.type_name,
+            "state": "idle",          # idle | running | failed | timeout
+            "interval_minutes": s.interval_minutes,
+            "started_at": None,
+            "finished_at": None,
+            "last_duration": None,
+            "last_error": None,
+        }
+        for s in SOURCES
+    },
+}
+
+
+def _set_source_status(name: str, **changes):
+    with _cache_lock:
+        _refresh_status["sources"][name].update(changes)
+
+
+def _on_source_started(adapter):
+    # Only once run_source holds the adapter's lock: a run that loses the
+    # race to another one is skipped and leaves the status alone
+    _set_source_status(adapter.name, state="running",
+                       started_at=datetime.utcnow().isoformat(), finished_at=None)
+
+
+def _on_source_finished(adapter, changed: Optional[bool] = None):
+    # Called when the run really ends, even if it outlived its timeout.
+    # A run that wrote nothing (most RSS ticks) keeps snapshot and caches.
+    if changed is not False:
+        try:
+            export_snapshot(DB_PATH, SNAPSHOT_DIR)
+        except Exception:
+            logging.exception("Snapshot export after %s failed", adapter.name)
+        _bump_generation()
+    with _cache_lock:
+        _refresh_status["sources"][adapter.name]["finished_at"] = datetime.utcnow().isoformat()
+
+
+def _refresh_source(adapter) -> SourceRun:
+    """Run one source now unless it is already running."""
+    run = run_source(adapter, DB_PATH, on_finish=_on_source_finished,
+                     on_start=_on_source_started)
+    if run.state != "skipped":
+        _set_source_status(adapter.name, state="idle" if run.state == "ok" else run.state,
+                           last_duration=round(run.duration, 3), last_error=run.error)
+    return run
+
+
+def schedule_refresh() -> bool:
+    """Start every idle source in the background; False if all are already running."""
+    started = False
+    for adapter in SOURCES:
+        if not adapter.running:
+            threading.Thread(target=_refresh_source, args=(adapter,),
+                             name=f"refresh-{adapter.name}", daemon=True).start()
+            started = True
+    return started
 
 # ---------------------------------------------------------------------------
 # FastAPI startup/shutdown hooks to keep the scheduler alive
@@ -33,88 +285,625 @@ def _refresh_feeds_wrapper():
 
 _scheduler: Optional[BackgroundScheduler] = None
 
+
+def _start_watches():
+    """Follow filesystem events for sources that support it (see watch.py)."""
+    for adapter in SOURCES:
+        try:
+            watching = adapter.start_watch(
+                DB_PATH, on_change=lambda adapter=adapter: _on_source_finished(adapter))
+        except Exception:
+            logging.exception("Source %s: watch mode failed, keeping scheduled scans", adapter.name)
+            continue
+        if watching and adapter.schedule_minutes != adapter.interval_minutes:
+            # Events keep it current; the periodic scan is only a safety net
+            _scheduler.reschedule_job(adapter.name, trigger="interval",
+                                      minutes=adapter.schedule_minutes)
+            _set_source_status(adapter.name, interval_minutes=adapter.schedule_minutes)
+
 @app.on_event("startup")
 def _on_startup():
     global _scheduler
-    _refresh_feeds_wrapper()  # initial population
+    # Serve whatever content.db already holds; populate it in the background
+    schedule_refresh()
     if not os.environ.get("VERCEL"):
-        _scheduler = BackgroundScheduler()
-        _scheduler.add_job(_refresh_feeds_wrapper, "interval", minutes=30, max_instances=1)
+        # One worker per source so they can all run at the same time
+        _scheduler = BackgroundScheduler(
+            executors={"default": {"type": "threadpool", "max_workers": max(len(SOURCES), 1)}}
+        )
+        for adapter in SOURCES:
+            _scheduler.add_job(_refresh_source, "interval", args=[adapter], id=adapter.name,
+                               minutes=adapter.interval_minutes, max_instances=1)
         _scheduler.start()
+        # Setting up watches walks the trees, so it stays off the startup path
+        threading.Thread(target=_start_watches, name="start-watches", daemon=True).start()
 
         # Ensure it is shut down properly on exit
         atexit.register(lambda: _scheduler.shutdown(wait=False) if _scheduler else None)
 
-@app.get("/")
-@app.get("/{limit}")
-def latest(limit: int = 300, per_source: int = 20, refresh: bool = False):
-    if refresh:
-        _refresh_feeds_wrapper()
-    with sqlite3.connect(DB_PATH) as conn:
+
+@contextmanager
+def _articles_db():
+    """Pooled read-only connection to DB_PATH (see db.reader), or None while
+    there is no articles table yet."""
+    if not os.path.exists(DB_PATH):
+        # First start: nothing fetched yet, the background refresh will fill it
+        yield None
+        return
+    with reader(DB_PATH) as conn:
+        has_table = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'articles'"
+        ).fetchone()
+        yield conn if has_table else None
+
+
+_snapshot = (None, None)     # (manifest (inode, mtime_ns), Snapshot)
+
+
+def _current_snapshot():
+    """The exported snapshot (see snapshot.py), reopened when its manifest changes."""
+    global _snapshot
+    try:
+        st = os.stat(os.path.join(SNAPSHOT_DIR, MANIFEST))
+    except OSError:
+        return None
+    key = (st.st_ino, st.st_mtime_ns)
+    with _cache_lock:
+        if _snapshot[0] == key:
+            return _snapshot[1]
+    snapshot = open_snapshot(SNAPSHOT_DIR)
+    with _cache_lock:
+        _snapshot = (key, snapshot)
+    return snapshot
+
+
+def _query_latest(limit: int, per_source: int) -> list:
+    # The snapshot holds exactly these rows, so a cache miss costs a lookup
+    # in a mapped file rather than a query (and no SQLite open at all on a
+    # fresh serverless instance)
+    snapshot = _current_snapshot() if per_source else None
+    if snapshot is not None:
+        try:
+            if per_source <= snapshot.per_source:
+                return snapshot.rows(per_source)
+        except (OSError, ValueError, KeyError) as exc:
+            logging.warning("⚠️  Snapshot %s unusable, querying content.db: %s", snapshot.name, exc)
+
+    with _articles_db() as conn:
+        if conn is None:
+            return []
         conn.row_factory = sqlite3.Row
         if per_source:
-            # Grab the most recent `per_source` items from each feed/source.
+            rows = conn.execute(PER_SOURCE_SQL.format(extra=""), (per_source,)).fetchall()
+        else:
+            # Fallback: simply take the latest `limit` rows overall.
             rows = conn.execute(
-                """
-                SELECT * FROM (
-                    SELECT *, ROW_NUMBER() OVER (PARTITION BY source ORDER BY published DESC) AS rn
-                    FROM articles
-                ) WHERE rn <= ?
-                """,
-                (per_source,)
+                f"SELECT {', '.join(ARTICLE_COLUMNS)} FROM articles ORDER BY published DESC LIMIT ?",
+                (limit,)
             ).fetchall()
+
+    # Convert to dicts so we can shuffle easily
+    return [dict(r) for r in rows]
+
+
+def _iter_latest_rows(limit: int, per_source: int):
+    """Yield latest() rows as dicts straight off the cursor, STREAM_BATCH at a time.
+
+    Instead of a shuffle (which needs every row in memory) rows come round-
+    robin: each source's newest item, then each source's second newest, …
+    so cutting the stream at `limit` stays fair across sources. The ordering
+    is done by SQLite, not in Python.
+    """
+    # The generator is advanced from Starlette's threadpool, so successive
+    # fetches may run on different (but never concurrent) threads; pooled
+    # connections allow that.
+    with _articles_db() as conn:
+        if conn is None:
+            return
+        if per_source:
+            cursor = conn.execute(
+                "SELECT * FROM ("
+                + PER_SOURCE_SQL.format(
+                    extra=", ROW_NUMBER() OVER (PARTITION BY a.source ORDER BY a.published DESC) AS _rank")
+                + ") ORDER BY _rank, published DESC LIMIT ?",
+                (per_source, limit or -1),
+            )
+            columns = [d[0] for d in cursor.description][:-1]
         else:
-            # Fallback: simply take the latest `limit` rows overall.
+            cursor = conn.execute(
+                f"SELECT {', '.join(ARTICLE_COLUMNS)} FROM articles ORDER BY published DESC LIMIT ?",
+                (limit or -1,)
+            )
+            columns = [d[0] for d in cursor.description]
+        try:
+            while True:
+                batch = cursor.fetchmany(STREAM_BATCH)
+                if not batch:
+                    break
+                for row in batch:
+                    yield dict(zip(columns, row))
+        finally:
+            # A client that disconnects mid-stream leaves the statement
+            # open; close it before the connection goes back to the pool
+            cursor.close()
+
+@app.get("/refresh/status")
+def refresh_status():
+    """State of each source's current (or last) background refresh."""
+    with _cache_lock:
+        sources = {name: dict(st) for name, st in _refresh_status["sources"].items()}
+        generation = _refresh_status["generation"]
+    states = {st["state"] for st in sources.values()}
+    return {
+        "state": "running" if "running" in states
+                 else "failed" if states & {"failed", "timeout"} else "idle",
+        "running": "running" in states,
+        "generation": generation,
+        "sources": sources,
+    }
+
+@app.get("/refresh/history")
+def refresh_history(source: Optional[str] = None, limit: int = 50):
+    """Most recent refresh_history rows (per feed, "*" = whole RSS refresh)."""
+    with _articles_db() as conn:
+        if conn is None:
+            return []
+        conn.row_factory = sqlite3.Row
+        try:
             rows = conn.execute(
-                "SELECT * FROM articles ORDER BY published DESC LIMIT ?", (limit,)
+                "SELECT * FROM refresh_history WHERE (? IS NULL OR source = ?) "
+                "ORDER BY started_at DESC, id DESC LIMIT ?",
+                (source, source, max(1, min(limit, 1000))),
             ).fetchall()
+        except sqlite3.OperationalError:
+            rows = []   # table not created yet (no refresh since upgrading)
+    return [dict(r) for r in rows]
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus text exposition of the in-process metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# ---------------------------------------------------------------------------
+# Full-text search over articles and local files (search_index, FTS5)
+# ---------------------------------------------------------------------------
+
+SEARCH_MAX_LIMIT = 100
+SEARCH_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# bm25() column weights: title, summary, source, folder_name
+SEARCH_WEIGHTS = (10.0, 1.0, 2.0, 2.0)
+# snippet() brackets matches with these control characters; the text is
+# HTML-escaped before they become <mark> tags (see _snippet_html)
+SNIPPET_OPEN, SNIPPET_CLOSE = "\x02", "\x03"
+
+
+def _fts_query(q: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, as a prefix.
+
+    Words are quoted so user input can never be read as FTS5 syntax
+    (AND/OR/NEAR, column filters, stray quotes, ...).
+    """
+    return " ".join(f'"{tok}"*' for tok in SEARCH_TOKEN_RE.findall(q))
+
+
+def _snippet_html(snippet: Optional[str]) -> Optional[str]:
+    """Escaped snippet text with the matches wrapped in <mark>."""
+    if snippet is None:
+        return None
+    return (html.escape(snippet, quote=False)
+            .replace(SNIPPET_OPEN, "<mark>").replace(SNIPPET_CLOSE, "</mark>"))
+
+
+@app.get("/search")
+def search(q: str = "", limit: int = 20, offset: int = 0):
+    """Ranked, paginated full-text search: best matches first."""
+    match = _fts_query(q)
+    if not match:
+        raise HTTPException(status_code=400, detail="Query must contain at least one word")
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    offset = max(0, offset)
+
+    if not os.path.exists(DB_PATH):
+        items = []
+    else:
+        with reader(DB_PATH) as conn:
+            conn.row_factory = sqlite3.Row
+            try:
+                # Fetch one extra row to know whether another page exists
+                rows = conn.execute(
+                    f"""
+                    SELECT a.id, a.source, a.title, a.link, a.published, a.kind,
+                           snippet(search_index, 1, char(2), char(3), '…', 24) AS snippet,
+                           bm25(search_index, {", ".join(map(str, SEARCH_WEIGHTS))}) AS score
+                    FROM search_index
+                    JOIN articles AS a ON a.id = search_index.rowid
+                    WHERE search_index MATCH ?
+                    ORDER BY score
+                    LIMIT ? OFFSET ?
+                    """,
+                    (match, limit + 1, offset),
+                ).fetchall()
+            except sqlite3.OperationalError as e:
+                if "no such table" in str(e):
+                    # Index not built yet; the next refresh runs the migration
+                    raise HTTPException(status_code=503, detail="Search index not ready")
+                raise
+        items = [dict(r, snippet=_snippet_html(r["snippet"])) for r in rows]
+
+    return {
+        "query": q,
+        "offset": offset,
+        "limit": limit,
+        "has_more": len(items) > limit,
+        "items": items[:limit],
+    }
+
+# ---------------------------------------------------------------------------
+# Paged listing – keyset pagination on (published, id), newest first
+# ---------------------------------------------------------------------------
+# Each page ends with an opaque cursor holding the last (published, id); the
+# next page continues strictly below it. Every filter combination is served
+# by an index whose trailing columns are (published, id) — id being the
+# rowid — so a page costs O(page size) however deep the client has paged.
+
+LIST_DEFAULT_LIMIT = 50
+LIST_MAX_LIMIT = 200
+LIST_COLUMNS = ", ".join(ARTICLE_COLUMNS)
+
+
+def _encode_cursor(published: str, row_id: int) -> str:
+    raw = json.dumps([published, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        published, row_id = json.loads(raw)
+        if not isinstance(published, str) or not isinstance(row_id, int):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return published, row_id
+
+
+def _parse_bound(value: Optional[str], name: str) -> Optional[str]:
+    """Normalize an ISO date/datetime to the text format stored in `published`."""
+    if not value:
+        return None
+    try:
+        return str(datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: expected ISO 8601 date")
+
+
+@app.get("/articles")
+def list_articles(
+    source: Optional[List[str]] = Query(None),
+    kind: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = LIST_DEFAULT_LIMIT,
+):
+    """Articles newest first, filtered by source/kind/date and paged by cursor.
+
+    `since` is inclusive and `until` exclusive; pass `next_cursor` from the
+    previous page as `cursor` to continue.
+    """
+    if kind is not None and kind not in (KIND_RSS, KIND_LOCAL_FILE):
+        raise HTTPException(status_code=400, detail=f"kind must be '{KIND_RSS}' or '{KIND_LOCAL_FILE}'")
+    limit = max(1, min(limit, LIST_MAX_LIMIT))
+
+    where, params = ["published IS NOT NULL"], []
+    if source:
+        where.append(f"source IN ({', '.join('?' * len(source))})")
+        params.extend(source)
+    if kind:
+        where.append("kind = ?")
+        params.append(kind)
+    since, until = _parse_bound(since, "since"), _parse_bound(until, "until")
+    if since:
+        where.append("published >= ?")
+        params.append(since)
+    if until:
+        where.append("published < ?")
+        params.append(until)
+    if cursor:
+        where.append("(published, id) < (?, ?)")
+        params.extend(_decode_cursor(cursor))
+
+    with _articles_db() as conn:
+        if conn is None:
+            return {"items": [], "next_cursor": None}
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(
+            f"SELECT {LIST_COLUMNS} FROM articles WHERE {' AND '.join(where)} "
+            "ORDER BY published DESC, id DESC LIMIT ?",
+            (*params, limit + 1),
+        ).fetchall()
+
+    items = [dict(r) for r in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = _encode_cursor(str(last["published"]), last["id"])
+    return {"items": items, "next_cursor": next_cursor}
+
+@app.get("/snapshot")
+def snapshot_manifest():
+    """Manifest of the current latest() snapshot: its name, hash and encodings."""
+    manifest = read_manifest(SNAPSHOT_DIR)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="No snapshot exported yet")
+    return Response(content=json.dumps(manifest), media_type="application/json",
+                    headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/snapshot/{name}")
+def snapshot_file(name: str, request: Request):
+    """A snapshot body by its content-addressed name, served from the mapped file.
+
+    The compressed copy is sent as is when the client accepts its encoding.
+    """
+    snapshot = _current_snapshot()
+    if snapshot is None or snapshot.name != name:
+        # An older snapshot some client still has the manifest for
+        snapshot = open_snapshot(SNAPSHOT_DIR, name)
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail="Snapshot not found")
+    headers = {
+        "ETag": snapshot.etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Vary": "Accept-Encoding",
+    }
+    if _not_modified(request, snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    encoding = _negotiate_encoding(request.headers.get("accept-encoding"))
+    if encoding not in snapshot.encodings:
+        encoding = "gzip" if encoding else None
+    if encoding is None:
+        body = gzip.decompress(snapshot.raw("gzip"))
+    else:
+        body = snapshot.raw(encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/")
+@app.get("/{limit}")
+def latest(request: Request, limit: int = 300, per_source: int = 20,
+           refresh: bool = False, stream: Optional[str] = None):
+    # `refresh=true` only schedules a background job; this request is
+    # answered from the current data. Poll /refresh/status for progress.
+    headers = {"Vary": "Accept-Encoding"}
+    if refresh:
+        headers["X-Refresh"] = "scheduled" if schedule_refresh() else "running"
+    encoding = _negotiate_encoding(request.headers.get("accept-encoding"))
+
+    # `stream=ndjson|json`: rows go from the SQLite cursor to the socket in
+    # batches, so memory stays flat and the first rows arrive immediately.
+    if stream is not None:
+        if stream not in ("ndjson", "json"):
+            raise HTTPException(status_code=400, detail="stream must be 'ndjson' or 'json'")
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        chunks = _json_chunks(_iter_latest_rows(limit, per_source), ndjson=stream == "ndjson")
+        return StreamingResponse(
+            _encode_stream(chunks, encoding),
+            media_type="application/x-ndjson" if stream == "ndjson" else "application/json",
+            headers=headers,
+        )
+
+    _check_external_writes()
+    key = (limit, per_source)
+    variant = random.randrange(CACHE_VARIANTS)
+    with _cache_lock:
+        generation = _generation
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+            cached = entry["variants"].get((variant, encoding))
+            if cached is not None:
+                body, used = cached
+                if used:
+                    headers["Content-Encoding"] = used
+                return Response(content=body, media_type="application/json", headers=headers)
 
-    # Convert to dicts first so we can shuffle easily
-    items = [dict(r) for r in rows]
-    random.shuffle(items)
+    if entry is None:
+        entry = {"items": _query_latest(limit, per_source), "variants": {}}
+
+    items = list(entry["items"])
+    random.Random(f"{generation}:{variant}").shuffle(items)
     # Trim the shuffled list to `limit` if that constraint is still desired.
-    return items[:limit] if limit else items
+    body = _serialize(items[:limit] if limit else items)
+    used = encoding if len(body) >= COMPRESS_MIN_BYTES else None
+    if used:
+        body = _compress(body, used)
+        headers["Content-Encoding"] = used
+
+    with _cache_lock:
+        # Don't store results computed against data a refresh has replaced
+        if generation == _generation:
+            entry = _cache.setdefault(key, entry)
+            entry["variants"][(variant, encoding)] = (body, used)
+            _cache.move_to_end(key)
+            while len(_cache) > CACHE_MAX_KEYS:
+                _cache.popitem(last=False)
+
+    return Response(content=body, media_type="application/json", headers=headers)
 
+# ---------------------------------------------------------------------------
 # File serving endpoint
-@app.get("/files/{file_hash}")
-def serve_file(file_hash: str):
-    """Serve local files by hash"""
+# ---------------------------------------------------------------------------
+
+FILE_CHUNK_SIZE = 256 * 1024
+PREVIEW_RETRY_SECONDS = 5     # Retry-After on a preview that is still being rendered
+
+
+@lru_cache(maxsize=4096)
+def _file_info(file_hash: str) -> Optional[tuple]:
+    """hash → (path, type, media_type, size, mtime_ns); cleared on refresh."""
     file_path, file_type = get_file_by_hash(DB_PATH, file_hash)
-    
-    if not file_path or not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="File not found")
-    
+    if not file_path:
+        return None
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+
     # Determine media type
-    import mimetypes
-    media_type = mimetypes.guess_type(file_path)[0]
-    if not media_type:
-        if file_type == '.pdf':
-            media_type = 'application/pdf'
-        elif file_type == '.epub':
-            media_type = 'application/epub+zip'
-        else:
-            media_type = 'application/octet-stream'
-    
-    # Extract filename for download
-    filename = os.path.basename(file_path)
-    
-    # For EPUB files, serve them inline so browser can try to handle or pass to system
     if file_type == '.epub':
-        return FileResponse(
-            file_path, 
-            media_type='application/epub+zip',
-            headers={
-                "Content-Disposition": f"inline; filename=\"{filename}\"",
-                "Content-Type": "application/epub+zip"
-            }
-        )
-    
-    return FileResponse(
-        file_path, 
+        media_type = 'application/epub+zip'
+    else:
+        media_type = mimetypes.guess_type(file_path)[0]
+        if not media_type:
+            if file_type == '.pdf':
+                media_type = 'application/pdf'
+            else:
+                media_type = 'application/octet-stream'
+    return file_path, file_type, media_type, st.st_size, st.st_mtime_ns
+
+
+def _parse_range(header: str, size: int) -> Optional[tuple]:
+    """Parse a single `bytes=` range into (start, end) inclusive.
+
+    Returns None for anything we don't serve partially (multiple ranges,
+    other units, garbage) so the caller falls back to the full file; raises
+    ValueError when the range is well-formed but unsatisfiable.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = (part.strip() for part in spec.strip().partition("-"))
+    if (not sep or not (first or last)
+            or (first and not first.isdigit()) or (last and not last.isdigit())):
+        return None
+    if first:
+        start = int(first)
+        end = int(last) if last else size - 1
+        if last and start > end:
+            return None
+    else:
+        # suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+        if not int(last):
+            raise ValueError("empty suffix range")
+    if start >= size:
+        raise ValueError("range not satisfiable")
+    return start, min(end, size - 1)
+
+
+def _iter_file(path: str, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(FILE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _current_file_info(file_hash: str) -> tuple:
+    """`_file_info` checked against the file on disk; 404 if it is gone."""
+    info = _file_info(file_hash)
+    if info is not None:
+        # Cached path/size/mtime may predate an edit or a move (the hash
+        # follows the content); one stat keeps them honest
+        try:
+            st = os.stat(info[0])
+        except OSError:
+            st = None
+        if st is None or (st.st_size, st.st_mtime_ns) != info[3:]:
+            _file_info.cache_clear()
+            info = _file_info(file_hash)
+    if info is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return info
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    return bool(inm) and (inm.strip() == "*" or etag in (t.strip() for t in inm.split(",")))
+
+
+@app.get("/files/{file_hash}/preview")
+def serve_preview(file_hash: str, request: Request):
+    """First-page thumbnail (PDF), cover (EPUB) or excerpt (TXT/MD) of a file.
+
+    Served from the on-disk preview cache (see previews.py), which the
+    local files refresh fills. Nothing is rendered here: a miss is queued
+    for the background and answered with 202 + Retry-After.
+    """
+    _, file_type, _, size, mtime_ns = _current_file_info(file_hash)
+    if not can_preview(file_type):
+        raise HTTPException(status_code=404, detail="No preview for this file type")
+    preview = get_preview_cache().get(file_hash, mtime_ns)
+    if preview is not None and preview.media_type is None:
+        raise HTTPException(status_code=404, detail="No preview for this file")
+
+    headers = {"ETag": f'"p{size:x}-{mtime_ns:x}"', "Cache-Control": "public, max-age=3600"}
+    body = None
+    if preview is not None:
+        if _not_modified(request, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        try:
+            with open(preview.path, "rb") as f:
+                body = f.read()
+        except OSError:
+            pass    # evicted between lookup and read
+    if body is None:
+        render_later(DB_PATH, file_hash)
+        return Response(status_code=202, headers={"Retry-After": str(PREVIEW_RETRY_SECONDS),
+                                                  "Cache-Control": "no-store"})
+    return Response(content=body, media_type=preview.media_type, headers=headers)
+
+
+@app.get("/files/{file_hash}")
+def serve_file(file_hash: str, request: Request):
+    """Serve local files by hash
+
+    Supports single-range `Range` requests (206) so PDF viewers can read
+    large books piecemeal, and ETag/`If-None-Match` revalidation (304).
+    """
+    info = _current_file_info(file_hash)
+
+    file_path, file_type, media_type, size, mtime_ns = info
+    etag = f'"{size:x}-{mtime_ns:x}"'
+
+    # Extract filename; files open inline so the browser can try to handle
+    # them (EPUBs may get passed on to the system)
+    filename = os.path.basename(file_path)
+    headers = {
+        "Content-Disposition": f"inline; filename=\"{filename}\"",
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": formatdate(mtime_ns / 1e9, usegmt=True),
+    }
+
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    start, end, status = 0, size - 1, 200
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        if byte_range:
+            start, end = byte_range
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    length = end - start + 1 if size else 0
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(
+        _iter_file(file_path, start, length),
+        status_code=status,
         media_type=media_type,
-        headers={
-            "Content-Disposition": f"inline; filename=\"{filename}\""
-        }
+        headers=headers,
     )
 
 # When running locally (e.g. via `vercel dev` or `uvicorn`), expose the same
@@ -122,6 +911,14 @@ def serve_file(file_hash: str):
 # `<host>/api/latest`.
 # This has no effect on Vercel production because that environment already
 # prefixes the function with "/api/latest".
+app.add_api_route("/api/latest/refresh/status", refresh_status, methods=["GET"])
+app.add_api_route("/api/latest/refresh/history", refresh_history, methods=["GET"])
+app.add_api_route("/api/metrics", metrics_endpoint, methods=["GET"])
+app.add_api_route("/api/search", search, methods=["GET"])
+app.add_api_route("/api/articles", list_articles, methods=["GET"])
+app.add_api_route("/api/snapshot", snapshot_manifest, methods=["GET"])
+app.add_api_route("/api/snapshot/{name}", snapshot_file, methods=["GET"])
 app.add_api_route("/api/latest", latest, methods=["GET"])
 app.add_api_route("/api/latest/{limit}", latest, methods=["GET"])
+app.add_api_route("/api/files/{file_hash}/preview", serve_preview, methods=["GET"])
 app.add_api_route("/api/files/{file_hash}", serve_file, methods=["GET"])
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark: streaming `_html_snippet` vs. the BeautifulSoup `_html_to_text`
+summary path, on real feed bodies.
+
+Usage
+-----
+$ python backend/benchmarks/bench_snippet.py --fetch   # download FEEDS into the corpus first
+$ python backend/benchmarks/bench_snippet.py [corpus_dir]
+
+The corpus is a directory of saved feed files (default:
+backend/benchmarks/corpus/). Every entry body is checked for identical
+output before anything is timed.
+"""
+import argparse
+import os
+import sys
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.dirname(SCRIPT_DIR))
+
+import feedparser  # noqa: E402
+
+from feeds import FEEDS, SNIPPET_CHARS, _html_snippet, _html_to_text, fetch_feeds  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(SCRIPT_DIR, "corpus")
+
+
+def old_summary(raw_html: str) -> str:
+    plain = _html_to_text(raw_html)
+    return plain[:SNIPPET_CHARS] + "…" if len(plain) > SNIPPET_CHARS else plain
+
+
+def fetch_corpus(corpus_dir: str) -> None:
+    os.makedirs(corpus_dir, exist_ok=True)
+    for res in fetch_feeds(FEEDS):
+        if res.error:
+            print(f"⚠️  {res.source}: {res.error}")
+            continue
+        with open(os.path.join(corpus_dir, f"{res.source}.xml"), "wb") as f:
+            f.write(res.content)
+        print(f"📥 {res.source}: {len(res.content) / 1024:.0f} KB")
+
+
+def load_bodies(corpus_dir: str) -> list:
+    bodies = []
+    for name in sorted(os.listdir(corpus_dir)):
+        with open(os.path.join(corpus_dir, name), "rb") as f:
+            d = feedparser.parse(f.read())
+        for e in d.entries:
+            bodies.append(e.content[0].value if e.get("content") else e.get("summary", ""))
+    return bodies
+
+
+def best_of(fn, bodies: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for body in bodies:
+            fn(body)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("corpus", nargs="?", default=DEFAULT_CORPUS)
+    parser.add_argument("--fetch", action="store_true", help="download FEEDS into the corpus first")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.fetch:
+        fetch_corpus(args.corpus)
+    if not os.path.isdir(args.corpus) or not os.listdir(args.corpus):
+        print(f"❌ Empty corpus: {args.corpus} (run with --fetch)")
+        sys.exit(1)
+
+    bodies = load_bodies(args.corpus)
+    total_kb = sum(len(b) for b in bodies) / 1024
+    print(f"📋 {len(bodies)} entries, {total_kb:.0f} KB of HTML")
+
+    mismatches = [b for b in bodies if old_summary(b) != _html_snippet(b)]
+    if mismatches:
+        print(f"❌ {len(mismatches)} entries differ, first one:")
+        print(repr(old_summary(mismatches[0])))
+        print(repr(_html_snippet(mismatches[0])))
+        sys.exit(1)
+    print("✅ Outputs identical")
+
+    old = best_of(old_summary, bodies, args.repeat)
+    new = best_of(_html_snippet, bodies, args.repeat)
+    print(f"BeautifulSoup  {old * 1000:8.1f} ms  ({old / len(bodies) * 1e6:7.1f} µs/entry)")
+    print(f"streaming      {new * 1000:8.1f} ms  ({new / len(bodies) * 1e6:7.1f} µs/entry)")
+    print(f"speed-up       {old / new:8.1f}×")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark suite on synthetic data.
+
+Builds a throw-away workspace (synthetic RSS/Atom/YouTube feeds behind a
+local HTTP stand-in, a LOCAL_FILES_DIRS-style tree, an onebird.sqlite) and
+times refresh_feeds, refresh_local_files, import_onebird_data, latest()
+(from SQLite and from an exported snapshot) and serve_file against a fresh
+content.db. Results are written as JSON so
+runs can be compared.
+
+Usage
+-----
+$ python backend/benchmarks/bench_suite.py --output before.json
+$ python backend/benchmarks/bench_suite.py --output after.json --compare before.json
+$ python backend/benchmarks/bench_suite.py --feeds 100 --latency 0.2 --error-rate 0.1
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+BACKEND_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path[:0] = [BACKEND_DIR, os.path.join(BACKEND_DIR, "api"), SCRIPT_DIR]
+
+from synthetic import FEED_KINDS, FeedServer, make_feed, make_local_tree, make_onebird_db  # noqa: E402
+
+import previews  # noqa: E402
+from feeds import refresh_feeds  # noqa: E402
+from import_onebird import import_onebird_data  # noqa: E402
+from local_files import refresh_local_files  # noqa: E402
+from snapshot import export_snapshot  # noqa: E402
+
+RESULTS_VERSION = 1
+
+
+def _quiet():
+    """Silence the emoji progress prints of the code under test."""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class Suite:
+    def __init__(self, args, workdir: str):
+        self.args = args
+        self.workdir = workdir
+        self.results = []
+        # Keep rendered previews out of backend/preview_cache
+        previews._cache = previews.PreviewCache(os.path.join(workdir, "previews"))
+
+    # -- helpers ------------------------------------------------------------
+
+    def fresh_db(self, name: str) -> str:
+        path = os.path.join(self.workdir, f"{name}.db")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        return path
+
+    def record(self, name: str, samples: list, **extra) -> None:
+        """Store timing *samples* (seconds) for *name* and print a summary line."""
+        samples = sorted(samples)
+        result = {
+            "name": name,
+            "runs": len(samples),
+            "min": samples[0],
+            "median": statistics.median(samples),
+            "mean": statistics.fmean(samples),
+        }
+        if len(samples) >= 20:
+            result["p95"] = samples[int(len(samples) * 0.95) - 1]
+        result.update(extra)
+        self.results.append(result)
+        unit, scale = ("ms", 1000) if result["median"] < 1 else ("s", 1)
+        info = "  ".join(f"{k}={v}" for k, v in extra.items())
+        print(f"  {name:<28} median {result['median'] * scale:9.2f} {unit:<2}  "
+              f"min {result['min'] * scale:9.2f} {unit:<2}  {info}", file=sys.stderr)
+
+    def timed(self, fn, *args, **kwargs) -> float:
+        start = time.perf_counter()
+        with _quiet():
+            fn(*args, **kwargs)
+        return time.perf_counter() - start
+
+    # -- scenarios ----------------------------------------------------------
+
+    def bench_feeds(self) -> str:
+        a = self.args
+        feeds = {
+            f"{FEED_KINDS[i % len(FEED_KINDS)]}_{i}": make_feed(
+                FEED_KINDS[i % len(FEED_KINDS)], f"feed{i}", a.entries, a.body_bytes, a.seed)
+            for i in range(a.feeds)
+        }
+        total_kb = sum(len(b) for b in feeds.values()) / 1024
+        print(f"📡 {a.feeds} feeds × {a.entries} entries ({total_kb:,.0f} KB), "
+              f"latency {a.latency * 1000:.0f} ms, errors {a.error_rate:.0%}", file=sys.stderr)
+
+        with FeedServer(feeds, a.latency, a.error_rate, a.seed) as server:
+            urls = {name: server.url(name) for name in feeds}
+            cold, warm = [], []
+            for _ in range(a.repeat):
+                db = self.fresh_db("feeds")
+                cold.append(self.timed(refresh_feeds, db, feeds=urls, due_only=False))
+                # Second pass ignores the schedule but sends the stored
+                # validators: 304s, nothing re-parsed
+                warm.append(self.timed(refresh_feeds, db, feeds=urls, due_only=False))
+            with sqlite3.connect(db) as conn:
+                stored = conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+            self.record("refresh_feeds.cold", cold, articles=stored,
+                        kb=round(total_kb), requests=server.requests)
+            self.record("refresh_feeds.warm", warm)
+        return db
+
+    def bench_local_files(self, db: str) -> None:
+        a = self.args
+        dirs = make_local_tree(os.path.join(self.workdir, "library"), a.folders, a.files,
+                               seed=a.seed)
+        print(f"📁 {a.files} files in {a.folders} folders", file=sys.stderr)
+        cold, warm = [], []
+        for _ in range(a.repeat):
+            scratch = self.fresh_db("local")
+            cold.append(self.timed(refresh_local_files, scratch, dirs=dirs))
+            warm.append(self.timed(refresh_local_files, scratch, dirs=dirs))
+        self.record("refresh_local_files.cold", cold, files=a.files)
+        self.record("refresh_local_files.warm", warm)
+        # Leave the files in the shared DB for the API benchmarks
+        with _quiet():
+            refresh_local_files(db, dirs=dirs)
+
+    def bench_onebird(self) -> None:
+        a = self.args
+        source = make_onebird_db(os.path.join(self.workdir, "onebird.sqlite"), a.onebird_posts,
+                                 seed=a.seed)
+        print(f"🐦 {a.onebird_posts} onebird posts "
+              f"({os.path.getsize(source) / 1e6:.0f} MB)", file=sys.stderr)
+        cold, rerun = [], []
+        for _ in range(a.repeat):
+            scratch = self.fresh_db("onebird")
+            cold.append(self.timed(import_onebird_data, source, scratch))
+            rerun.append(self.timed(import_onebird_data, source, scratch))
+        self.record("import_onebird.cold", cold, posts=a.onebird_posts,
+                    posts_per_s=round(a.onebird_posts / statistics.median(cold)))
+        self.record("import_onebird.rerun", rerun)
+
+    def bench_api(self, db: str) -> None:
+        a = self.args
+        from fastapi.testclient import TestClient
+        import latest
+
+        latest.DB_PATH = db
+        # No snapshot at first: the cold numbers are for the SQLite query
+        latest.SNAPSHOT_DIR = os.path.join(self.workdir, "snapshots")
+        latest._bump_generation()
+        # No `with`: startup hooks (background refresh, scheduler) stay off
+        client = TestClient(latest.app)
+
+        def get(path, **kwargs):
+            start = time.perf_counter()
+            response = client.get(path, **kwargs)
+            elapsed = time.perf_counter() - start
+            assert response.status_code in (200, 206), (path, response.status_code)
+            return elapsed, response
+
+        print(f"🌐 {a.requests} requests per endpoint", file=sys.stderr)
+        cold = []
+        for _ in range(a.repeat):
+            latest._bump_generation()
+            cold.append(get("/api/latest")[0])
+        self.record("latest.cold_cache", cold)
+        with _quiet():
+            export_snapshot(db, latest.SNAPSHOT_DIR)
+        cold = []
+        for _ in range(max(a.repeat, 3)):
+            # As on a fresh instance: map and decode the snapshot, no DB query
+            latest._snapshot = (None, None)
+            latest._bump_generation()
+            cold.append(get("/api/latest")[0])
+        self.record("latest.cold_snapshot", cold)
+        # Cache miss with the snapshot already mapped: a slice, no query
+        cold = []
+        for _ in range(max(a.repeat, 3)):
+            latest._bump_generation()
+            cold.append(get("/api/latest")[0])
+        self.record("latest.cold_cache_snapshot", cold)
+        samples = [get("/api/latest")[0] for _ in range(a.requests)]
+        self.record("latest.warm", samples, bytes=len(get("/api/latest")[1].content))
+        samples = [get("/api/latest", params={"stream": "ndjson"})[0]
+                   for _ in range(max(a.requests // 10, 3))]
+        self.record("latest.stream_ndjson", samples)
+
+        with sqlite3.connect(db) as conn:
+            hashes = [h for (h,) in conn.execute("SELECT file_hash FROM local_files LIMIT 100")]
+        if not hashes:
+            return
+        samples = [get(f"/api/files/{hashes[i % len(hashes)]}")[0] for i in range(a.requests)]
+        self.record("serve_file.full", samples)
+        samples = [get(f"/api/files/{hashes[i % len(hashes)]}", headers={"Range": "bytes=0-1023"})[0]
+                   for i in range(a.requests)]
+        self.record("serve_file.range", samples)
+
+        with sqlite3.connect(db) as conn:
+            hashes = [h for (h,) in conn.execute(
+                "SELECT file_hash FROM local_files WHERE file_type IN ('.txt', '.md') LIMIT 100")]
+        if hashes:
+            samples = [get(f"/api/files/{hashes[i % len(hashes)]}/preview")[0]
+                       for i in range(a.requests)]
+            self.record("serve_file.preview", samples)
+
+    def run(self) -> dict:
+        started = datetime.utcnow().isoformat()
+        db = self.bench_feeds()
+        self.bench_local_files(db)
+        self.bench_onebird()
+        self.bench_api(db)
+        return {
+            "version": RESULTS_VERSION,
+            "meta": {
+                "started_at": started,
+                "commit": _git_commit(),
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "params": vars(self.args),
+            },
+            "results": self.results,
+        }
+
+
+def compare(current: dict, baseline_path: str) -> None:
+    """Print the change in median time per benchmark against a saved run."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+    print(f"\n📊 vs {baseline_path}", file=sys.stderr)
+    for result in current["results"]:
+        old = baseline.get(result["name"])
+        if not old:
+            continue
+        change = (result["median"] - old["median"]) / old["median"] * 100 if old["median"] else 0.0
+        icon = "🟢" if change <= -5 else "🔴" if change >= 5 else "⚪"
+        print(f"  {icon} {result['name']:<28} {old['median'] * 1000:10.2f} → "
+              f"{result['median'] * 1000:10.2f} ms  ({change:+.1f}%)", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--feeds", type=int, default=30)
+    parser.add_argument("--entries", type=int, default=30, help="entries per feed")
+    parser.add_argument("--body-bytes", type=int, default=3000, help="HTML per entry")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per feed request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500 responses")
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--folders", type=int, default=3)
+    parser.add_argument("--onebird-posts", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=200, help="API requests per endpoint")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per refresh/import benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="keep the generated data here instead of a temp dir")
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    parser.add_argument("--compare", help="JSON results of an earlier run to diff against")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="feeds-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        results = Suite(args, workdir).run()
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"✅ Results → {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
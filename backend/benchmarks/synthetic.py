@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Synthetic inputs for the benchmark suite (see bench_suite.py).
+
+• `make_feed(kind, name, entries, body_bytes)` – RSS 2.0, Atom or
+  YouTube-style Atom, deterministic for a given seed.
+• `FeedServer` – local HTTP stand-in serving those feeds with ETag/304,
+  configurable latency and a fraction of failing requests.
+• `make_local_tree(root, …)` – a LOCAL_FILES_DIRS-style folder tree.
+• `make_onebird_db(path, posts)` – an onebird.sqlite with a `posts` table.
+"""
+import hashlib
+import http.server
+import os
+import random
+import sqlite3
+import threading
+import time
+from email.utils import formatdate
+from html import escape
+
+FEED_KINDS = ("rss", "atom", "youtube")
+BASE_TIME = 1_700_000_000   # fixed epoch so runs are comparable
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+         "tempor incididunt ut labore et dolore magna aliqua progress works "
+         "science ideas growth research").split()
+
+
+def _html_body(rng: random.Random, size: int) -> str:
+    """Feed-like HTML: paragraphs, inline markup, entities, a script block."""
+    parts, length = [], 0
+    while length < size:
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 60)))
+        para = (f"<p>{words} &amp; <b>{rng.choice(WORDS)}</b> "
+                f"<a href=\"https://example.com/{rng.randint(0, 9999)}\">link</a> &#8212; {words}</p>")
+        if rng.random() < 0.1:
+            para += "<script>var tracking = {id: %d};</script>" % rng.randint(0, 1 << 30)
+        parts.append(para)
+        length += len(para)
+    return "".join(parts)
+
+
+def make_feed(kind: str, name: str, entries: int = 30, body_bytes: int = 2000,
+              seed: int = 0, base_url: str = "https://example.com") -> bytes:
+    """Return a synthetic feed document of the given *kind*."""
+    rng = random.Random(f"{seed}:{name}")
+    items = []
+    for i in range(entries):
+        ts = BASE_TIME + i * 3600 * rng.randint(1, 48)
+        link = f"{base_url}/{name}/{i}"
+        title = escape(f"{name} post {i}: {' '.join(rng.choice(WORDS) for _ in range(5))}")
+        body = _html_body(rng, body_bytes)
+        if kind == "rss":
+            items.append(
+                f"<item><title>{title}</title><link>{link}</link>"
+                f"<pubDate>{formatdate(ts)}</pubDate>"
+                f"<description><![CDATA[{body}]]></description></item>"
+            )
+        else:
+            updated = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))
+            if kind == "youtube":
+                video = hashlib.md5(link.encode()).hexdigest()[:11]
+                items.append(
+                    f"<entry><id>yt:video:{video}</id><yt:videoId>{video}</yt:videoId>"
+                    f"<title>{title}</title>"
+                    f"<link rel=\"alternate\" href=\"https://www.youtube.com/watch?v={video}\"/>"
+                    f"<published>{updated}</published><updated>{updated}</updated>"
+                    f"<media:group><media:title>{title}</media:title>"
+                    f"<media:description>{escape(body)}</media:description></media:group></entry>"
+                )
+            else:
+                items.append(
+                    f"<entry><id>{link}</id><title>{title}</title><link href=\"{link}\"/>"
+                    f"<updated>{updated}</updated>"
+                    f"<content type=\"html\">{escape(body)}</content></entry>"
+                )
+    if kind == "rss":
+        return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+                f"<title>{name}</title><link>{base_url}</link>{''.join(items)}</channel></rss>").encode()
+    namespaces = ('xmlns="http://www.w3.org/2005/Atom" '
+                  'xmlns:yt="http://www.youtube.com/xml/schemas/2015" '
+                  'xmlns:media="http://search.yahoo.com/mrss/"')
+    return (f'<?xml version="1.0" encoding="UTF-8"?><feed {namespaces}>'
+            f"<title>{name}</title>{''.join(items)}</feed>").encode()
+
+
+class FeedServer:
+    """Serve {path: body} on 127.0.0.1 with ETag/304, latency and errors.
+
+    *latency* (seconds) is added to every request; *error_rate* is the
+    fraction of requests answered with a 500.
+    """
+
+    def __init__(self, feeds: dict, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.feeds = {f"/{name}": body for name, body in feeds.items()}
+        self.etags = {path: '"%s"' % hashlib.md5(body).hexdigest() for path, body in self.feeds.items()}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = None
+
+    def _handler(self):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, status, body=b"", headers=()):
+                self.send_response(status)
+                for key, value in headers:
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                    fail = server._rng.random() < server.error_rate
+                if server.latency:
+                    time.sleep(server.latency)
+                body = server.feeds.get(self.path)
+                if fail:
+                    return self._reply(500, b"synthetic error")
+                if body is None:
+                    return self._reply(404)
+                etag = server.etags[self.path]
+                if self.headers.get("If-None-Match") == etag:
+                    return self._reply(304, headers=[("ETag", etag)])
+                self._reply(200, body, [("ETag", etag), ("Content-Type", "application/xml")])
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self) -> "FeedServer":
+        self._httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def url(self, name: str) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/{name}"
+
+
+def make_local_tree(root: str, folders: int = 3, files: int = 1000, depth: int = 3,
+                    file_bytes: int = 4096, seed: int = 0) -> dict:
+    """Create *files* documents spread over *folders* nested trees.
+
+    Returns a LOCAL_FILES_DIRS-style {folder name: directory} mapping.
+    """
+    rng = random.Random(seed)
+    extensions = (".pdf", ".epub", ".docx", ".txt", ".md")
+    dirs = {}
+    for f in range(folders):
+        directory = os.path.join(root, f"folder{f}")
+        dirs[f"Folder {f}"] = directory
+        os.makedirs(directory, exist_ok=True)
+    names = list(dirs.values())
+    for i in range(files):
+        sub = [f"d{rng.randint(0, 9)}" for _ in range(rng.randint(0, depth))]
+        directory = os.path.join(names[i % len(names)], *sub)
+        os.makedirs(directory, exist_ok=True)
+        # A few files that the scanner must skip
+        extension = ".tmp" if i % 50 == 49 else rng.choice(extensions)
+        with open(os.path.join(directory, f"doc_{i:06d}{extension}"), "wb") as fh:
+            fh.write(rng.randbytes(rng.randint(file_bytes // 2, file_bytes * 2)))
+    return dirs
+
+
+def make_onebird_db(path: str, posts: int = 10000, content_chars: int = 1500, seed: int = 0) -> str:
+    """Write an onebird.sqlite with *posts* rows in the schema the importer reads."""
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE posts(id INTEGER PRIMARY KEY, title_tc TEXT, url TEXT, "
+                     "content_tc TEXT, date TEXT)")
+        conn.executemany(
+            "INSERT INTO posts(title_tc, url, content_tc, date) VALUES (?, ?, ?, ?)",
+            (
+                (
+                    f"標題 {i} " + " ".join(rng.choice(WORDS) for _ in range(4)),
+                    f"https://onebird.example/p/{i}",
+                    "內容 " * rng.randint(content_chars // 8, content_chars // 2),
+                    time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(BASE_TIME + i * 600)),
+                )
+                for i in range(posts)
+            ),
+        )
+    return path
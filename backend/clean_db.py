@@ -7,7 +7,10 @@ Usage
 $ python backend/clean_db.py           # delete all rows (keeps schema)
 $ python backend/clean_db.py --nuke    # delete the entire DB file
 """
-import os, argparse, sqlite3, sys
+import os, argparse, sys
+
+from db import writer
+from snapshot import MANIFEST, SNAPSHOT_DIR
 
 SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
 DB_PATH = os.path.join(SCRIPT_DIR, "content.db")
@@ -25,7 +28,16 @@ if args.nuke:
     os.remove(DB_PATH)
     print("💥 content.db removed. Re-run feeder.py to recreate and repopulate.")
 else:
-    with sqlite3.connect(DB_PATH) as conn:
+    with writer(DB_PATH) as conn:
         conn.execute("DELETE FROM articles")
-        conn.commit()
-    print("🧹 All rows deleted from the articles table. Re-run feeder.py to repopulate.") 
\ No newline at end of file
+        # Stored validators and body hashes would make every feed come back
+        # as "not modified", leaving the table empty
+        conn.execute("DELETE FROM feed_fetch_state")
+        # Same for the onebird import checkpoint
+        conn.execute("DELETE FROM import_state")
+    print("🧹 All rows deleted from the articles table. Re-run feeder.py to repopulate.") 
+
+# Without a manifest the API reads content.db again until the next export
+if os.path.exists(os.path.join(SNAPSHOT_DIR, MANIFEST)):
+    os.remove(os.path.join(SNAPSHOT_DIR, MANIFEST))
+    print("📦 Snapshot manifest removed.")
@@ -0,0 +1,560 @@
+#!/usr/bin/env python3
+"""
+Shared SQLite helpers for content.db.
+
+• `connect(db_path)` opens a connection with WAL and write-friendly pragmas.
+• `BulkWriter` collects rows per statement and writes them with
+  `executemany` inside one transaction instead of one INSERT per row.
+• `ensure_schema(conn)` creates/migrates every content.db table, tracked
+  via `PRAGMA user_version`, including the `search_index` FTS5 table that
+  triggers keep in step with `articles`.
+• `add_history(writer, ...)` records one refresh_history row (phase
+  timings and counts per feed or local scan).
+• `writer(db_path)` / `reader(db_path)` are how modules share content.db:
+  one serialized writer per database with short BEGIN IMMEDIATE
+  transactions, and a pool of reused read-only connections for the API.
+  `write_lock(db_path)` is the same lock for writers with their own
+  connection; `checkpoint(db_path)` ends a command-line run with
+  everything in the main file.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Iterator, Sequence, Union
+from urllib.parse import quote
+
+# WAL lets readers (the API) keep going while a refresh writes; NORMAL is
+# durable enough in WAL mode and avoids an fsync per commit. Negative
+# cache_size is in KiB (~64 MB).
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+)
+
+# Sources refresh in parallel, so a writer may have to wait for another's
+# transaction; give it longer than sqlite3's default 5 s before "locked".
+BUSY_TIMEOUT = 30
+
+BATCH_SIZE = 5000
+
+# Idle read-only connections kept per database; more are opened on demand
+# under load and closed again when returned to a full pool.
+READ_POOL_SIZE = 8
+
+# Stay well below SQLite's host-parameter limit in `IN (?, ?, ...)` lookups
+MAX_SQL_PARAMS = 500
+
+# Values of articles.kind
+KIND_RSS = "rss"
+KIND_LOCAL_FILE = "local_file"
+
+# refresh_history retention and the columns add_history() accepts
+HISTORY_KEEP_DAYS = 30
+HISTORY_COLUMNS = (
+    "started_at", "kind", "source", "status",
+    "fetch_seconds", "parse_seconds", "strip_seconds", "write_seconds", "scan_seconds",
+    "bytes", "new_items", "updated_items", "unchanged_items", "removed_items", "error",
+)
+
+# Length of an article summary cut from feed HTML or extracted file text
+SNIPPET_CHARS = 280
+
+# Local file rows use "<folder_name>(local file)" as their source
+LOCAL_FILE_SUFFIX = "(local file)"
+FOLDER_NAME_SQL = (
+    f"CASE WHEN {{row}}.kind = '{KIND_LOCAL_FILE}' "
+    f"THEN substr({{row}}.source, 1, length({{row}}.source) - {len(LOCAL_FILE_SUFFIX)}) "
+    "ELSE '' END"
+)
+
+# Local file rows link to "/api/files/<file_hash>". What search_index holds
+# as their summary: the text extract.py pulled out of the file, so documents
+# are searchable by content (the stored summary is only its opening), or
+# the summary while there is no text.
+FILE_LINK_PREFIX = "/api/files/"
+SEARCH_SUMMARY_SQL = (
+    f"CASE WHEN {{row}}.kind = '{KIND_LOCAL_FILE}' THEN COALESCE("
+    "(SELECT text FROM local_file_text "
+    f"WHERE file_hash = substr({{row}}.link, {len(FILE_LINK_PREFIX) + 1})), {{row}}.summary) "
+    "ELSE {row}.summary END"
+)
+_REINDEX_FILE_SQL = f"""
+            DELETE FROM search_index WHERE rowid IN (
+                SELECT id FROM articles WHERE link = '{FILE_LINK_PREFIX}' || {{row}}.file_hash);
+            INSERT INTO search_index(rowid, title, summary, source, folder_name)
+            SELECT id, title, {SEARCH_SUMMARY_SQL.format(row="articles")}, source,
+                   {FOLDER_NAME_SQL.format(row="articles")}
+            FROM articles WHERE link = '{FILE_LINK_PREFIX}' || {{row}}.file_hash;"""
+
+# search_index triggers that read SEARCH_SUMMARY_SQL (migrations 7 and 9)
+_SEARCH_TRIGGERS = (
+    f"""CREATE TRIGGER articles_search_ai AFTER INSERT ON articles BEGIN
+            INSERT INTO search_index(rowid, title, summary, source, folder_name)
+            VALUES (NEW.id, NEW.title, {SEARCH_SUMMARY_SQL.format(row="NEW")}, NEW.source,
+                    {FOLDER_NAME_SQL.format(row="NEW")});
+        END""",
+    f"""CREATE TRIGGER articles_search_au
+            AFTER UPDATE OF title, summary, source, kind, link ON articles BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id;
+            INSERT INTO search_index(rowid, title, summary, source, folder_name)
+            VALUES (NEW.id, NEW.title, {SEARCH_SUMMARY_SQL.format(row="NEW")}, NEW.source,
+                    {FOLDER_NAME_SQL.format(row="NEW")});
+        END""",
+    f"""CREATE TRIGGER local_file_text_search_ai AFTER INSERT ON local_file_text BEGIN
+            {_REINDEX_FILE_SQL.format(row="NEW")}
+        END""",
+    f"""CREATE TRIGGER local_file_text_search_au AFTER UPDATE OF text ON local_file_text BEGIN
+            {_REINDEX_FILE_SQL.format(row="NEW")}
+        END""",
+    f"""CREATE TRIGGER local_file_text_search_ad AFTER DELETE ON local_file_text BEGIN
+            {_REINDEX_FILE_SQL.format(row="OLD")}
+        END""",
+)
+
+# What the API returns for an article; internal columns (content_hash)
+# stay out of responses and snapshots
+ARTICLE_COLUMNS = ("id", "source", "title", "link", "published", "summary", "kind")
+
+# Most recent `per_source` items from each feed/source. Both steps walk
+# idx_articles_source_published: a loose index scan over the distinct
+# sources, then a LIMIT per source, so the cost tracks
+# (#sources × per_source) rather than table size.
+PER_SOURCE_SQL = f"""
+    WITH RECURSIVE sources(source) AS (
+        SELECT MIN(source) FROM articles
+        UNION ALL
+        SELECT (SELECT MIN(source) FROM articles WHERE source > sources.source)
+        FROM sources WHERE sources.source IS NOT NULL
+    )
+    SELECT {", ".join(f"a.{c}" for c in ARTICLE_COLUMNS)}{{extra}} FROM sources
+    JOIN articles AS a ON a.id IN (
+        SELECT id FROM articles
+        WHERE source = sources.source
+        ORDER BY published DESC LIMIT ?
+    )
+"""
+
+# Per-feed schedule columns of feed_fetch_state (see feeds.py)
+SCHEDULE_COLUMNS = (
+    ("error_count", "INTEGER NOT NULL DEFAULT 0"),
+    ("hint_seconds", "REAL"),
+    ("interval_seconds", "REAL"),
+    ("next_fetch", "DATETIME"),
+)
+
+
+def _add_missing_columns(table: str, columns: Sequence[tuple]) -> Callable[[sqlite3.Connection], None]:
+    """Migration step: ALTER TABLE ADD COLUMN for each (name, decl) *table* lacks."""
+    def step(conn: sqlite3.Connection) -> None:
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for name, decl in columns:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+    return step
+
+
+# Schema migrations, applied in order; PRAGMA user_version records how many
+# have run. A step is SQL or a callable taking the connection. Only ever
+# append to this list.
+MIGRATIONS: list[tuple[Union[str, Callable[[sqlite3.Connection], None]], ...]] = [
+    # 1: base table (previously created ad hoc by feeds.py)
+    (
+        """CREATE TABLE IF NOT EXISTS articles(
+            id INTEGER PRIMARY KEY,
+            source TEXT,
+            title TEXT,
+            link TEXT UNIQUE,
+            published DATETIME,
+            summary TEXT
+        )""",
+    ),
+    # 2: explicit kind column instead of the "(local file)" suffix check,
+    #    plus indexes for per-source top-N and kind filtering
+    (
+        f"ALTER TABLE articles ADD COLUMN kind TEXT NOT NULL DEFAULT '{KIND_RSS}'",
+        f"UPDATE articles SET kind = '{KIND_LOCAL_FILE}' WHERE source LIKE '%local file)'",
+        "CREATE INDEX IF NOT EXISTS idx_articles_source_published ON articles(source, published DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_articles_kind_published ON articles(kind, published DESC)",
+    ),
+    # 3: per-entry content hash so unchanged feed entries can be skipped
+    (
+        "ALTER TABLE articles ADD COLUMN content_hash TEXT",
+    ),
+    # 4: full-text index over articles (RSS + local files), rowid = articles.id,
+    #    kept in sync by triggers so every writer updates it incrementally
+    (
+        """CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+            title, summary, source, folder_name,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )""",
+        f"""CREATE TRIGGER IF NOT EXISTS articles_search_ai AFTER INSERT ON articles BEGIN
+            INSERT INTO search_index(rowid, title, summary, source, folder_name)
+            VALUES (NEW.id, NEW.title, NEW.summary, NEW.source, {FOLDER_NAME_SQL.format(row="NEW")});
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS articles_search_ad AFTER DELETE ON articles BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id;
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS articles_search_au
+            AFTER UPDATE OF title, summary, source, kind ON articles BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id;
+            INSERT INTO search_index(rowid, title, summary, source, folder_name)
+            VALUES (NEW.id, NEW.title, NEW.summary, NEW.source, {FOLDER_NAME_SQL.format(row="NEW")});
+        END""",
+        f"""INSERT INTO search_index(rowid, title, summary, source, folder_name)
+            SELECT id, title, summary, source, {FOLDER_NAME_SQL.format(row="articles")} FROM articles""",
+    ),
+    # 5: keyset listing orders by (published DESC, id DESC). An ascending
+    #    (…, published) index carries the rowid ascending too, so scanning it
+    #    backwards yields exactly that order with no sort step; the DESC
+    #    indexes from migration 2 would still need a temp b-tree for id.
+    (
+        "DROP INDEX IF EXISTS idx_articles_source_published",
+        "DROP INDEX IF EXISTS idx_articles_kind_published",
+        "CREATE INDEX idx_articles_source_published ON articles(source, published)",
+        "CREATE INDEX idx_articles_kind_published ON articles(kind, published)",
+        "CREATE INDEX IF NOT EXISTS idx_articles_published ON articles(published)",
+    ),
+    # 6: one row per feed / local scan per refresh with phase timings and
+    #    counts (see add_history); trimmed to HISTORY_KEEP_DAYS
+    (
+        """CREATE TABLE IF NOT EXISTS refresh_history(
+            id INTEGER PRIMARY KEY,
+            started_at DATETIME NOT NULL,
+            kind TEXT NOT NULL,
+            source TEXT NOT NULL,
+            status TEXT NOT NULL,
+            fetch_seconds REAL,
+            parse_seconds REAL,
+            strip_seconds REAL,
+            write_seconds REAL,
+            scan_seconds REAL,
+            bytes INTEGER,
+            new_items INTEGER,
+            updated_items INTEGER,
+            unchanged_items INTEGER,
+            removed_items INTEGER,
+            error TEXT
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_refresh_history_started ON refresh_history(started_at)",
+        "CREATE INDEX IF NOT EXISTS idx_refresh_history_source ON refresh_history(source, started_at)",
+    ),
+    # 7: text extracted from local files (see extract.py), one row per
+    #    local_files.file_hash; the search triggers now index that text with
+    #    the file's summary and re-index a file whenever its text changes
+    (
+        """CREATE TABLE IF NOT EXISTS local_file_text(
+            file_hash TEXT PRIMARY KEY,
+            file_size INTEGER,
+            modified_time DATETIME,
+            status TEXT NOT NULL,
+            title TEXT,
+            author TEXT,
+            summary TEXT,
+            text TEXT,
+            error TEXT,
+            extracted_at DATETIME
+        )""",
+        "DROP TRIGGER IF EXISTS articles_search_ai",
+        "DROP TRIGGER IF EXISTS articles_search_au",
+        *_SEARCH_TRIGGERS,
+    ),
+    # 8: tables feeds.py, local_files.py and import_onebird.py used to create
+    #    (and extend) ad hoc, so existing databases may already have some
+    #    of them: every step tolerates that
+    (
+        """CREATE TABLE IF NOT EXISTS feed_fetch_state(
+            source TEXT PRIMARY KEY,
+            url TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            content_hash TEXT,
+            last_status INTEGER,
+            last_duration REAL,
+            last_fetched DATETIME
+        )""",
+        _add_missing_columns("feed_fetch_state", SCHEDULE_COLUMNS),
+        """CREATE TABLE IF NOT EXISTS local_files(
+            id INTEGER PRIMARY KEY,
+            file_hash TEXT UNIQUE,
+            file_path TEXT,
+            title TEXT,
+            file_type TEXT,
+            file_size INTEGER,
+            modified_time DATETIME,
+            folder_name TEXT
+        )""",
+        # Fingerprint cache key (device, inode, mtime_ns), see local_files.py
+        _add_missing_columns("local_files", [(n, "INTEGER") for n in ("device", "inode", "mtime_ns")]),
+        # Watch mode looks rows up by path (see refresh_local_paths)
+        "CREATE INDEX IF NOT EXISTS idx_local_files_path ON local_files(file_path)",
+        """CREATE TABLE IF NOT EXISTS import_state(
+            source TEXT PRIMARY KEY,
+            high_water INTEGER NOT NULL,
+            updated_at DATETIME
+        )""",
+    ),
+    # 9: local files are indexed by their extracted text alone, not summary
+    #    + text: the summary is that text's opening, so search snippets
+    #    repeated it
+    (
+        *(f"DROP TRIGGER IF EXISTS {name}" for name in (
+            "articles_search_ai", "articles_search_au", "local_file_text_search_ai",
+            "local_file_text_search_au", "local_file_text_search_ad")),
+        *_SEARCH_TRIGGERS,
+        f"""DELETE FROM search_index WHERE rowid IN (
+            SELECT id FROM articles WHERE kind = '{KIND_LOCAL_FILE}')""",
+        f"""INSERT INTO search_index(rowid, title, summary, source, folder_name)
+            SELECT id, title, {SEARCH_SUMMARY_SQL.format(row="articles")}, source,
+                   {FOLDER_NAME_SQL.format(row="articles")}
+            FROM articles WHERE kind = '{KIND_LOCAL_FILE}'""",
+    ),
+]
+
+
+def connect(db_path: str, **kwargs) -> sqlite3.Connection:
+    """Open *db_path* with the shared pragmas applied."""
+    kwargs.setdefault("timeout", BUSY_TIMEOUT)
+    conn = sqlite3.connect(db_path, **kwargs)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def _connect_readonly(db_path: str) -> sqlite3.Connection:
+    path = os.path.abspath(db_path)
+    params = "mode=ro"
+    if not os.access(os.path.dirname(path), os.W_OK):
+        # Read-only filesystem (e.g. the deployed content.db on Vercel): a
+        # WAL database can't create its -shm file there, so open it as
+        # immutable. Nothing can write it anyway, and command-line runs
+        # leave no WAL behind (see checkpoint).
+        params += "&immutable=1"
+    conn = sqlite3.connect(
+        f"file:{quote(path)}?{params}", uri=True,
+        timeout=BUSY_TIMEOUT, check_same_thread=False,
+    )
+    conn.execute("PRAGMA cache_size=-16384")
+    conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+class ReadPool:
+    """Reusable read-only connections to one database file.
+
+    Connections are opened with `mode=ro` and `query_only`, so a bug in a
+    read path cannot take the write lock. In WAL mode they never wait for
+    the writer. If the file is replaced (clean_db --nuke, a restore) the
+    idle connections are dropped instead of reading the old inode.
+    """
+
+    def __init__(self, db_path: str, size: int = READ_POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle: list[sqlite3.Connection] = []
+        self._identity = None
+        self._lock = threading.Lock()
+
+    def acquire(self) -> sqlite3.Connection:
+        st = os.stat(self.db_path)   # FileNotFoundError while there is no DB yet
+        identity = (st.st_dev, st.st_ino)
+        with self._lock:
+            if identity != self._identity:
+                stale, self._idle, self._identity = self._idle, [], identity
+            else:
+                stale = []
+            conn = self._idle.pop() if self._idle else None
+        for old in stale:
+            old.close()
+        return conn or _connect_readonly(self.db_path)
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        conn.row_factory = None
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        """Close the idle connections (borrowed ones close when returned to a full pool)."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_read_pools: dict[str, ReadPool] = {}
+_write_locks: dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+@contextmanager
+def reader(db_path: str) -> Iterator[sqlite3.Connection]:
+    """Borrow a pooled read-only connection to *db_path*.
+
+    Close any cursor you leave unfinished before the block ends: an open
+    statement keeps its read snapshot and holds back WAL checkpoints.
+    """
+    key = os.path.abspath(db_path)
+    with _registry_lock:
+        pool = _read_pools.get(key)
+        if pool is None:
+            pool = _read_pools[key] = ReadPool(key)
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+def write_lock(db_path: str) -> threading.Lock:
+    """The lock `writer()` holds for *db_path*, for code that must keep its
+    own connection (e.g. one with an ATTACHed database)."""
+    key = os.path.abspath(db_path)
+    with _registry_lock:
+        return _write_locks.setdefault(key, threading.Lock())
+
+
+@contextmanager
+def writer(db_path: str) -> Iterator[sqlite3.Connection]:
+    """Run the block as the only writer of *db_path* in this process.
+
+    Writers (parallel sources, imports) queue on a per-database lock instead
+    of spinning on SQLITE_BUSY, and the schema is migrated first. The block
+    is one BEGIN IMMEDIATE transaction – committed on success, rolled back
+    on error – so keep network and parsing work outside it; long jobs
+    should take the writer once per batch so readers see progress and the
+    WAL can checkpoint in between.
+    """
+    with write_lock(db_path):
+        conn = connect(db_path)
+        try:
+            ensure_schema(conn)
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+
+def checkpoint(db_path: str) -> None:
+    """Fold the WAL back into *db_path*, so the file on its own holds every commit.
+
+    Command-line scripts call this last: pooled readers (`mode=ro`) can't
+    checkpoint and keep the WAL open, and the refresh workflows commit
+    content.db without its -wal file.
+    """
+    if not os.path.exists(db_path):
+        return
+    with _registry_lock:
+        pool = _read_pools.get(os.path.abspath(db_path))
+    if pool is not None:
+        pool.close()
+    with write_lock(db_path):
+        conn = connect(db_path)
+        try:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    """Apply any migrations in MIGRATIONS that have not run on *conn* yet."""
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= len(MIGRATIONS):
+        return
+    if conn.in_transaction:
+        conn.commit()
+    # Take the write lock before re-reading the version so two processes
+    # starting at once cannot both run the same migration.
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            for step in statements:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {number}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def add_history(writer: "BulkWriter", **fields) -> None:
+    """Queue one refresh_history row; unknown columns are a programming error."""
+    unknown = set(fields) - set(HISTORY_COLUMNS)
+    if unknown:
+        raise TypeError(f"unknown refresh_history columns: {sorted(unknown)}")
+    writer.add(
+        f"INSERT INTO refresh_history ({', '.join(HISTORY_COLUMNS)}) "
+        f"VALUES ({', '.join('?' * len(HISTORY_COLUMNS))})",
+        tuple(fields.get(c) for c in HISTORY_COLUMNS),
+    )
+
+
+def prune_history(conn: sqlite3.Connection, keep_days: int = HISTORY_KEEP_DAYS) -> None:
+    conn.execute(
+        "DELETE FROM refresh_history WHERE started_at < ?",
+        (datetime.utcnow() - timedelta(days=keep_days),),
+    )
+
+
+class BulkWriter:
+    """Buffer rows per SQL statement and flush them with `executemany`.
+
+    Pending statements are always flushed together, in the order they were
+    first queued, so e.g. a DELETE queued before INSERTs still runs first.
+    Use as a context manager to get a single transaction that commits on
+    success and rolls back on error::
+
+        with BulkWriter(conn) as w:
+            for row in rows:
+                w.add("INSERT OR IGNORE INTO articles (...) VALUES (?,?,?,?,?)", row)
+    """
+
+    def __init__(self, conn: sqlite3.Connection, batch_size: int = BATCH_SIZE):
+        self.conn = conn
+        self.batch_size = batch_size
+        self._pending: dict[str, list[Sequence]] = defaultdict(list)
+        self.written = 0
+
+    def add(self, sql: str, row: Sequence) -> None:
+        batch = self._pending[sql]
+        batch.append(row)
+        if len(batch) >= self.batch_size:
+            self.flush()
+
+    def add_many(self, sql: str, rows: Iterable[Sequence]) -> None:
+        for row in rows:
+            self.add(sql, row)
+
+    def flush(self) -> None:
+        pending, self._pending = self._pending, defaultdict(list)
+        for sql, batch in pending.items():
+            self.conn.executemany(sql, batch)
+            self.written += len(batch)
+
+    def __enter__(self) -> "BulkWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.flush()
+            self.conn.commit()
+        else:
+            self._pending.clear()
+            self.conn.rollback()
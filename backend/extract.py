@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Text extraction for local files (PDF, EPUB, DOCX, TXT, MD).
+
+• `extract_file(path, file_type)` returns the embedded title/author and the
+  first MAX_TEXT_CHARS of text (PDFs: the first PDF_PAGES pages). EPUB and
+  DOCX are read with zipfile + ElementTree; PDFs need the optional `pypdf`
+  package and are left alone without it.
+• `refresh_extracted_text(db_path)` runs after each local files scan. Files
+  whose (size, mtime) already match their `local_file_text` row are
+  skipped; the rest are extracted in a process pool with a bounded number
+  of jobs in flight and written EXTRACT_BATCH files per transaction, so
+  memory stays flat however large the library is.
+• The snippet (plus author) becomes the file's article summary and the text
+  is indexed by search_index (see db migration 7).
+• Run directly: `python backend/extract.py [--all]` (--all re-extracts
+  every file).
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import re
+import sqlite3
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from html.parser import HTMLParser
+from typing import NamedTuple, Optional
+from xml.etree import ElementTree
+
+from db import FILE_LINK_PREFIX, KIND_LOCAL_FILE, SNIPPET_CHARS, BulkWriter, reader, writer
+from metrics import EXTRACTED_FILES, REFRESH_PHASE_SECONDS
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # optional: PDFs keep their file-info summary
+    PdfReader = None
+
+MAX_TEXT_CHARS = 100_000    # stored (and indexed) per file
+PDF_PAGES = 20              # pages read from the start of a PDF
+EXTRACT_WORKERS = (
+    len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+)
+EXTRACT_BATCH = 20          # files written per transaction
+# Reached from the scheduler and watch threads of the API process: like
+# feeds.PARSE_POOL_CONTEXT, never fork workers from it
+EXTRACT_POOL_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+_SPACES_RE = re.compile(r"[ \t\r\f\v\xa0]+")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n\s*")
+
+
+class Extracted(NamedTuple):
+    status: str                 # ok | empty | error
+    title: Optional[str] = None
+    author: Optional[str] = None
+    text: str = ""
+    error: Optional[str] = None
+
+
+def _clean(text: str) -> str:
+    """Collapse runs of spaces and blank lines, keep paragraph breaks."""
+    text = _SPACES_RE.sub(" ", text)
+    text = _BLANK_LINES_RE.sub("\n\n", text)
+    return text.strip()[:MAX_TEXT_CHARS]
+
+
+def _meta(value) -> Optional[str]:
+    value = " ".join(str(value).split()) if value else ""
+    return value or None
+
+# ---------------------------------------------------------------------------
+# Per-format extractors: path → (title, author, text)
+# ---------------------------------------------------------------------------
+
+class _LimitReached(Exception):
+    pass
+
+
+class _TextCollector(HTMLParser):
+    """Visible text of (X)HTML, stopping once *limit* chars are collected."""
+
+    SKIP_TAGS = {"script", "style", "head", "title"}
+    BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6",
+                  "blockquote", "section", "article", "pre"}
+
+    def __init__(self, limit: int):
+        super().__init__()
+        self.limit = limit
+        self.parts: list[str] = []
+        self.size = 0
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip = max(self._skip - 1, 0)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        self.parts.append(data)
+        self.size += len(data)
+        if self.size >= self.limit:
+            raise _LimitReached
+
+
+def _html_text(raw: bytes, limit: int) -> str:
+    collector = _TextCollector(limit)
+    try:
+        collector.feed(raw.decode("utf-8", errors="replace"))
+        collector.close()
+    except _LimitReached:
+        pass
+    return "".join(collector.parts)
+
+
+def _extract_plain(path: str):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        text = f.read(MAX_TEXT_CHARS)
+    title = None
+    if path.lower().endswith(".md"):
+        # First ATX heading, e.g. "# Title"
+        match = re.search(r"(?m)^#\s+(.+?)\s*#*\s*$", text)
+        title = match.group(1) if match else None
+    return title, None, text
+
+
+EPUB_NS = {
+    "c": "urn:oasis:names:tc:opendocument:xmlns:container",
+    "opf": "http://www.idpf.org/2007/opf",
+    "dc": "http://purl.org/dc/elements/1.1/",
+}
+
+
+def read_opf(book: zipfile.ZipFile):
+    """(path, parsed root) of an open EPUB's package document (the OPF)."""
+    container = ElementTree.fromstring(book.read("META-INF/container.xml"))
+    opf_path = container.find(".//c:rootfile", EPUB_NS).get("full-path")
+    return opf_path, ElementTree.fromstring(book.read(opf_path))
+
+
+def _extract_epub(path: str):
+    with zipfile.ZipFile(path) as book:
+        opf_path, opf = read_opf(book)
+        title = opf.findtext(".//dc:title", None, EPUB_NS)
+        author = opf.findtext(".//dc:creator", None, EPUB_NS)
+
+        base = os.path.dirname(opf_path)
+        hrefs = {item.get("id"): item.get("href")
+                 for item in opf.iterfind(".//opf:manifest/opf:item", EPUB_NS)}
+        parts, size = [], 0
+        # Chapters in reading order until enough text is collected
+        for itemref in opf.iterfind(".//opf:spine/opf:itemref", EPUB_NS):
+            href = hrefs.get(itemref.get("idref"))
+            if not href:
+                continue
+            try:
+                raw = book.read(os.path.normpath(os.path.join(base, href)).replace(os.sep, "/"))
+            except KeyError:
+                continue
+            chunk = _html_text(raw, MAX_TEXT_CHARS - size)
+            parts.append(chunk)
+            size += len(chunk)
+            if size >= MAX_TEXT_CHARS:
+                break
+    return title, author, "\n".join(parts)
+
+
+DOCX_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def _extract_docx(path: str):
+    with zipfile.ZipFile(path) as doc:
+        title = author = None
+        if "docProps/core.xml" in doc.namelist():
+            core = ElementTree.fromstring(doc.read("docProps/core.xml"))
+            title = core.findtext("dc:title", None, EPUB_NS)
+            author = core.findtext("dc:creator", None, EPUB_NS)
+
+        # Stream the body: w:t runs are the text, w:p ends a paragraph
+        parts, size = [], 0
+        with doc.open("word/document.xml") as body:
+            for _, element in ElementTree.iterparse(body):
+                if element.tag == f"{DOCX_W}t" and element.text:
+                    parts.append(element.text)
+                    size += len(element.text)
+                elif element.tag == f"{DOCX_W}p":
+                    parts.append("\n")
+                    element.clear()
+                    if size >= MAX_TEXT_CHARS:
+                        break
+    return title, author, "".join(parts)
+
+
+def _extract_pdf(path: str):
+    pdf = PdfReader(path)
+    meta = pdf.metadata or {}
+    parts, size = [], 0
+    for page in pdf.pages[:PDF_PAGES]:
+        text = page.extract_text() or ""
+        parts.append(text)
+        size += len(text)
+        if size >= MAX_TEXT_CHARS:
+            break
+    return meta.get("/Title"), meta.get("/Author"), "\n\n".join(parts)
+
+
+EXTRACTORS = {
+    ".txt": _extract_plain,
+    ".md": _extract_plain,
+    ".epub": _extract_epub,
+    ".docx": _extract_docx,
+}
+if PdfReader is not None:
+    EXTRACTORS[".pdf"] = _extract_pdf
+
+
+def extract_file(path: str, file_type: str) -> Extracted:
+    """Title, author and leading text of one file; never raises."""
+    extractor = EXTRACTORS.get(file_type.lower())
+    if extractor is None:
+        return Extracted("error", error=f"no extractor for {file_type}")
+    try:
+        title, author, text = extractor(path)
+    except Exception as exc:
+        return Extracted("error", error=f"{type(exc).__name__}: {exc}"[:500])
+    text = _clean(text)
+    return Extracted("ok" if text else "empty", _meta(title), _meta(author), text)
+
+
+def file_summary(extracted: Extracted) -> Optional[str]:
+    """Article summary for an extracted file, or None to keep the file info."""
+    if not extracted.text:
+        return None
+    snippet = " ".join(extracted.text[:SNIPPET_CHARS * 2].split())
+    if len(snippet) > SNIPPET_CHARS:
+        snippet = snippet[:SNIPPET_CHARS] + "…"
+    return f"by {extracted.author} · {snippet}" if extracted.author else snippet
+
+# ---------------------------------------------------------------------------
+# Incremental refresh
+# ---------------------------------------------------------------------------
+
+PENDING_SQL = f"""
+    SELECT f.file_hash, f.file_path, f.file_type, f.file_size, f.modified_time
+    FROM local_files AS f
+    LEFT JOIN local_file_text AS t ON t.file_hash = f.file_hash
+    WHERE (t.file_hash IS NULL OR t.file_size IS NOT f.file_size
+           OR t.modified_time IS NOT f.modified_time)
+      AND lower(f.file_type) IN ({", ".join("?" * len(EXTRACTORS))})
+"""
+
+
+def _extract_job(job: tuple) -> tuple:
+    file_hash, path, file_type, size, mtime = job
+    return job, extract_file(path, file_type)
+
+
+def _iter_extracted(jobs: list):
+    """Yield (job, Extracted) as workers finish, at most 2× workers in flight."""
+    pool = None
+    if EXTRACT_WORKERS > 1 and len(jobs) > 1:
+        try:
+            pool = ProcessPoolExecutor(max_workers=min(EXTRACT_WORKERS, len(jobs)),
+                                       mp_context=EXTRACT_POOL_CONTEXT)
+        except (OSError, NotImplementedError) as exc:
+            logging.warning("⚠️  extract pool unavailable (%s); extracting inline", exc)
+    if pool is None:
+        for job in jobs:
+            yield _extract_job(job)
+        return
+
+    with pool:
+        queue, in_flight = iter(jobs), set()
+        while True:
+            for job in queue:
+                in_flight.add(pool.submit(_extract_job, job))
+                if len(in_flight) >= EXTRACT_WORKERS * 2:
+                    break
+            if not in_flight:
+                return
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def _write_batch(db_path: str, batch: list) -> None:
+    now = datetime.utcnow()
+    with writer(db_path) as conn, BulkWriter(conn) as bulk:
+        for (file_hash, _, _, size, mtime), result in batch:
+            summary = file_summary(result)
+            bulk.add(
+                """INSERT OR REPLACE INTO local_file_text
+                    (file_hash, file_size, modified_time, status, title, author,
+                     summary, text, error, extracted_at)
+                    VALUES (?,?,?,?,?,?,?,?,?,?)""",
+                (file_hash, size, mtime, result.status, result.title, result.author,
+                 summary, result.text or None, result.error, now),
+            )
+            if summary:
+                bulk.add(
+                    "UPDATE articles SET title = COALESCE(?, title), summary = ? "
+                    "WHERE link = ? AND kind = ?",
+                    (result.title, summary, FILE_LINK_PREFIX + file_hash, KIND_LOCAL_FILE),
+                )
+
+
+def refresh_extracted_text(db_path: str, full: bool = False) -> bool:
+    """Extract text for new/changed local files and drop rows of removed ones.
+
+    Returns whether any file was extracted (their articles rows change too).
+    """
+    if not os.path.exists(db_path):
+        return False
+    with reader(db_path) as conn:
+        try:
+            jobs = conn.execute(
+                "SELECT file_hash, file_path, file_type, file_size, modified_time "
+                f"FROM local_files WHERE lower(file_type) IN ({', '.join('?' * len(EXTRACTORS))})"
+                if full else PENDING_SQL,
+                tuple(EXTRACTORS),
+            ).fetchall()
+        except sqlite3.OperationalError as exc:
+            # No local_files table (nothing scanned) or schema not migrated yet
+            logging.info("📄 Nothing to extract (%s)", exc)
+            return False
+
+    with writer(db_path) as conn:
+        conn.execute(
+            "DELETE FROM local_file_text WHERE file_hash NOT IN (SELECT file_hash FROM local_files)"
+        )
+    if not jobs:
+        return False
+    if PdfReader is None:
+        logging.info("📄 pypdf not installed: PDFs keep their file-info summary")
+
+    print(f"📄 Extracting text from {len(jobs)} files")
+    started = time.perf_counter()
+    batch, counts = [], {}
+    for job, result in _iter_extracted(jobs):
+        EXTRACTED_FILES.inc(type=job[2].lower(), status=result.status)
+        counts[result.status] = counts.get(result.status, 0) + 1
+        batch.append((job, result))
+        if len(batch) >= EXTRACT_BATCH:
+            _write_batch(db_path, batch)
+            batch = []
+    if batch:
+        _write_batch(db_path, batch)
+    elapsed = time.perf_counter() - started
+    REFRESH_PHASE_SECONDS.observe(elapsed, kind=KIND_LOCAL_FILE, phase="extract")
+    print(f"✅ Extracted {len(jobs)} files in {elapsed:.1f}s ("
+          + ", ".join(f"{n} {status}" for status, n in sorted(counts.items())) + ")")
+    return True
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    DB_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "content.db")
+    refresh_extracted_text(DB_PATH, full="--all" in sys.argv[1:])
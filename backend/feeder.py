@@ -1,14 +1,20 @@
 #!/usr/bin/env python3
 """Command–line helper to populate backend/content.db.
-Run:  python backend/feeder.py
-This delegates to feeds.refresh_feeds so the logic lives in one place.
+Run:  python backend/feeder.py [--force]
+Every feed is fetched (conditional GETs; --force re-downloads and re-parses
+them in full). This delegates to feeds.refresh_feeds so the logic lives in one place.
 """
 import os
+import sys
+from db import checkpoint
 from feeds import refresh_feeds
+from snapshot import export_snapshot
 
 SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
 DB_PATH = os.path.join(SCRIPT_DIR, "content.db")
 
 if __name__ == "__main__":
-    refresh_feeds(DB_PATH)
+    refresh_feeds(DB_PATH, due_only=False, force="--force" in sys.argv[1:])
+    export_snapshot(DB_PATH)
+    checkpoint(DB_PATH)
     print("✅ Feeds refreshed via feeder.py →", DB_PATH) 
\ No newline at end of file
@@ -3,23 +3,47 @@
 Shared feed utilities.
 
 • FEEDS dictionary is defined in one place.
-• `refresh_feeds(db_path)` populates/updates the SQLite database.
+• `fetch_feeds(feeds)` downloads every feed concurrently (pooled session,
+  bounded worker pool, per-host concurrency limit).
+• `parse_feeds(jobs)` turns raw feed bodies into normalized entry rows,
+  on a process pool when there is enough work.
+• `refresh_feeds(db_path)` populates/updates the SQLite database. Per-feed
+  ETag/Last-Modified/body hash live in `feed_fetch_state`, so unchanged
+  feeds are neither re-downloaded nor re-parsed, and each feed is only
+  fetched once its adaptive `next_fetch` time has come.
 • Can be run directly: `python backend/feeds.py` to refresh backend/content.db.
 """
 from __future__ import annotations
 
 import os
+import hashlib
 import logging
+import multiprocessing
+import random
+import statistics
 import sqlite3
+import sys
 import textwrap
+import threading
+import time
 import traceback
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from html.entities import html5 as HTML5_ENTITIES
+from html.parser import HTMLParser
+from typing import NamedTuple, Optional
+from urllib.parse import urlsplit
 import html, re
 
 import feedparser
 import requests
 from bs4 import BeautifulSoup  # relies on beautifulsoup4 dependency
 
+from db import (KIND_LOCAL_FILE, KIND_RSS, SNIPPET_CHARS, BulkWriter, add_history, prune_history,
+                reader, writer)
+from metrics import (FEED_BYTES, FEED_ENTRIES, FEED_FETCH_SECONDS, FEED_FETCHES,
+                     REFRESH_PHASE_SECONDS)
+
 # ---------------------------------------------------------------------------
 # RSS/Atom feeds to ingest – edit in ONE PLACE only.
 # ---------------------------------------------------------------------------
@@ -41,8 +65,28 @@ FEEDS: dict[str, str] = {
     "yt_ml_course":         "https://www.youtube.com/feeds/videos.xml?playlist_id=PLJV_el3uVTsNZEFAdQsDeOdzAaHTca2Gi",
 }
 
+# ---------------------------------------------------------------------------
+# Fetch settings
+# ---------------------------------------------------------------------------
+USER_AGENT = "Mozilla/5.0 (compatible; InterestingFeeds/1.0)"
+FETCH_TIMEOUT = 10      # seconds, per request
+FETCH_WORKERS = 16      # size of the download thread pool
+PER_HOST_LIMIT = 2      # max simultaneous requests against one host
+
+# Parse settings – feedparser + HTML cleanup are CPU-bound, so big refreshes
+# are spread over a process pool; small ones aren't worth the worker start-up.
+PARSE_WORKERS = (
+    len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+)
+PARSE_POOL_MIN_BYTES = 1_000_000   # total feed bytes before the pool is used
+# Workers are never forked from this process: it runs uvicorn, the
+# scheduler and fetch threads, and a child forked while one of them holds
+# a lock (logging, sqlite) can deadlock on it
+PARSE_POOL_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
 TAG_RE = re.compile(r"<[^>]+>")
-SNIPPET_CHARS = 280
 
 def _html_to_text(raw_html: str) -> str:
     """Return plain-text version of an HTML fragment suitable for previews."""
@@ -52,82 +96,752 @@ def _html_to_text(raw_html: str) -> str:
     # use BeautifulSoup to get text (handles entities, nested tags)
     return BeautifulSoup(txt, "html.parser").get_text(separator=" ").strip()
 
+
+class _SnippetDone(Exception):
+    pass
+
+
+class _SnippetParser(HTMLParser):
+    """Collect text the way `BeautifulSoup(...).get_text(" ")` would, but
+    without building a tree, and stop as soon as *limit* chars are known.
+
+    Mirrors bs4's html.parser builder: data between two markup events forms
+    one string; whitespace-only strings collapse to "\n" or " " (except
+    inside <pre>/<textarea>); text under script/style/template/rt/rp,
+    comments, doctypes and PIs is dropped; CDATA is kept; unknown entities
+    stay literal but lose their ";".
+    """
+
+    SKIP_TAGS = {"script", "style", "template", "rt", "rp"}
+    PRESERVE_TAGS = {"pre", "textarea"}
+    VOID_TAGS = {
+        "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen",
+        "link", "menuitem", "meta", "param", "source", "track", "wbr",
+        "basefont", "bgsound", "command", "frame", "image", "isindex",
+        "nextid", "spacer",
+    }
+    ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+
+    def __init__(self, limit: int):
+        # Resolve references ourselves, like bs4 does
+        super().__init__(convert_charrefs=False)
+        self.limit = limit
+        self._pending: list[str] = []
+        self._stack: list[str] = []
+        self._closed_voids: list[str] = []
+        self.text = ""          # " ".join(strings).lstrip()
+
+    def _in(self, names: set) -> bool:
+        return any(tag in names for tag in self._stack)
+
+    def _emit(self, data: str, keep: bool) -> None:
+        if not self._in(self.PRESERVE_TAGS) and not data.strip(self.ASCII_SPACES):
+            data = "\n" if "\n" in data else " "
+        if not keep:
+            return
+        self.text = (self.text + " " + data if self.text else data).lstrip()
+        # Enough once a non-space char sits past the cut: the final
+        # strip() can then no longer shorten the text below the limit.
+        if self.text[self.limit:].strip():
+            raise _SnippetDone
+
+    def _flush(self) -> None:
+        if self._pending:
+            data, self._pending = "".join(self._pending), []
+            self._emit(data, not self._in(self.SKIP_TAGS))
+
+    def handle_data(self, data):
+        self._pending.append(data)
+
+    def handle_entityref(self, name):
+        char = HTML5_ENTITIES.get(name + ";") or HTML5_ENTITIES.get(name)
+        self._pending.append(char if char is not None else "&" + name)
+
+    def handle_charref(self, name):
+        # html.unescape applies the HTML5 numeric reference rules
+        # (windows-1252 remapping, U+FFFD for invalid code points)
+        self._pending.append(html.unescape(f"&#{name};"))
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in self.VOID_TAGS:
+            # closed implicitly; a later explicit </tag> is swallowed
+            self._closed_voids.append(tag)
+        else:
+            self._stack.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self._closed_voids:
+            self._closed_voids.remove(tag)
+            return
+        self._flush()
+        if tag in self._stack:
+            idx = len(self._stack) - 1 - self._stack[::-1].index(tag)
+            del self._stack[idx:]
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush()
+
+    def unknown_decl(self, data):
+        self._flush()
+        if data.upper().startswith("CDATA["):
+            self._emit(data[len("CDATA["):], True)
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+
+SCRIPT_STYLE_RE = re.compile(r"(?is)<(script|style).*?>.*?</\1>")
+_SCRIPT_STYLE_START_RE = re.compile(r"(?i)<(script|style)")
+_CHARREF_END_RE = re.compile(r"[\t\n\f <;]")
+
+
+def _iter_clean_html(raw_html: str, chunk_size: int):
+    """Yield pieces of `SCRIPT_STYLE_RE.sub("", html.unescape(raw_html))`
+    while only unescaping/scanning as far into *raw_html* as is consumed.
+
+    Chunks are cut before any character reference that might continue into
+    the next chunk, and a possible <script>/<style> block is held back until
+    its end tag (or the end of input) is in view, so the concatenated output
+    is identical to the eager version.
+    """
+    n = len(raw_html)
+    pos = 0
+    buf = ""
+    step = chunk_size
+    while True:
+        if pos < n:
+            end = min(pos + step, n)
+            if end < n:
+                amp = raw_html.rfind("&", pos, end)
+                if amp >= 0 and not _CHARREF_END_RE.search(raw_html, amp + 1, end):
+                    if amp > pos:
+                        end = amp
+                    else:
+                        m = _CHARREF_END_RE.search(raw_html, end)
+                        end = m.end() if m else n
+            buf += html.unescape(raw_html[pos:end])
+            pos = end
+        done = pos >= n
+
+        while True:
+            start = _SCRIPT_STYLE_START_RE.search(buf)
+            if not start:
+                if done:
+                    yield buf
+                    return
+                # a "<scrip" cut off at the end may still become a block
+                keep = max(len(buf) - len("<script") + 1, 0)
+                yield buf[:keep]
+                buf = buf[keep:]
+                break
+            block = SCRIPT_STYLE_RE.match(buf, start.start())
+            if block:
+                yield buf[:start.start()]
+                buf = buf[block.end():]
+            elif done:
+                # never closed: the "<" is ordinary markup after all
+                yield buf[:start.start() + 1]
+                buf = buf[start.start() + 1:]
+            else:
+                yield buf[:start.start()]
+                buf = buf[start.start():]
+                break
+        # While waiting on an open block, read further ahead each round so
+        # a long one isn't rescanned chunk by chunk.
+        step = step * 2 if _SCRIPT_STYLE_START_RE.match(buf) else chunk_size
+
+
+def _html_snippet(raw_html: str, limit: int = SNIPPET_CHARS, chunk_size: int = 2048) -> str:
+    """Preview text for an entry: same result as truncating
+    `_html_to_text(raw_html)` to *limit* chars (plus "…"), but unescapes and
+    parses only as much of the HTML as needed instead of building a full
+    soup."""
+    parser = _SnippetParser(limit)
+    try:
+        for piece in _iter_clean_html(raw_html or "", chunk_size):
+            if piece:
+                parser.feed(piece)
+        parser.close()
+        parser._flush()
+    except _SnippetDone:
+        return parser.text[:limit] + "…"
+
+    plain = parser.text.strip()
+    return plain[:limit] + "…" if len(plain) > limit else plain
+
+# ---------------------------------------------------------------------------
+# Fetch stage – network only, runs concurrently
+# ---------------------------------------------------------------------------
+
+class FetchResult(NamedTuple):
+    source: str
+    url: str
+    status: Optional[int]       # HTTP status, None if the request failed
+    content: Optional[bytes]    # raw body, None on error or 304
+    duration: float             # seconds spent on the request
+    error: Optional[str]
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    max_age: Optional[float] = None     # Cache-Control max-age, seconds
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    """Return the shared, connection-pooled HTTP session."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=FETCH_WORKERS, pool_maxsize=FETCH_WORKERS
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            _session = session
+        return _session
+
+
+def _fetch_one(
+    src: str,
+    url: str,
+    host_limit: threading.BoundedSemaphore,
+    validators: Optional[dict] = None,
+) -> FetchResult:
+    headers = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    start = time.monotonic()
+    try:
+        with host_limit:
+            resp = _get_session().get(url, timeout=FETCH_TIMEOUT, headers=headers)
+        resp.raise_for_status()
+        return FetchResult(
+            src, url, resp.status_code,
+            None if resp.status_code == 304 else resp.content,
+            time.monotonic() - start, None,
+            resp.headers.get("ETag"), resp.headers.get("Last-Modified"),
+            _max_age(resp.headers.get("Cache-Control")),
+        )
+    except Exception as exc:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+        return FetchResult(src, url, status, None, time.monotonic() - start, str(exc))
+
+
+def fetch_feeds(
+    feeds: dict[str, str], validators: Optional[dict[str, dict]] = None
+) -> list[FetchResult]:
+    """Download every feed in *feeds* concurrently.
+
+    Requests share one pooled session; at most FETCH_WORKERS run at once and
+    at most PER_HOST_LIMIT against the same host, so total time is bounded by
+    the slowest feed rather than the sum. Results keep the order of *feeds*.
+
+    *validators* maps a source to its stored ``etag``/``last_modified``; those
+    are sent as ``If-None-Match``/``If-Modified-Since`` so unchanged feeds
+    come back as a bodyless 304.
+    """
+    if not feeds:
+        return []
+    validators = validators or {}
+
+    host_limits = {
+        urlsplit(url).netloc: threading.BoundedSemaphore(PER_HOST_LIMIT)
+        for url in feeds.values()
+    }
+    with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(feeds))) as pool:
+        futures = [
+            pool.submit(
+                _fetch_one, src, url, host_limits[urlsplit(url).netloc], validators.get(src)
+            )
+            for src, url in feeds.items()
+        ]
+        return [f.result() for f in futures]
+
+# ---------------------------------------------------------------------------
+# Per-feed fetch state (conditional GET + body hash)
+# ---------------------------------------------------------------------------
+
+def _load_fetch_state(db: sqlite3.Connection) -> dict[str, dict]:
+    db.row_factory = sqlite3.Row
+    try:
+        rows = db.execute("SELECT * FROM feed_fetch_state").fetchall()
+    finally:
+        db.row_factory = None
+    return {r["source"]: dict(r) for r in rows}
+
+
+def _save_fetch_state(
+    writer: BulkWriter, res: FetchResult, prev: Optional[dict], content_hash: Optional[str]
+) -> None:
+    """Record the outcome of one fetch.
+
+    A fresh body replaces the validators outright; 304s and errors keep the
+    previous ones since servers rarely resend them.
+    """
+    prev = prev or {}
+    if res.content is not None:
+        prev = {"content_hash": prev.get("content_hash")}
+    writer.add(
+        """INSERT OR REPLACE INTO feed_fetch_state
+            (source, url, etag, last_modified, content_hash, last_status, last_duration, last_fetched)
+            VALUES (?,?,?,?,?,?,?,?)""",
+        (
+            res.source,
+            res.url,
+            res.etag or prev.get("etag"),
+            res.last_modified or prev.get("last_modified"),
+            content_hash or prev.get("content_hash"),
+            res.status,
+            res.duration,
+            datetime.utcnow(),
+        ),
+    )
+
+# ---------------------------------------------------------------------------
+# Adaptive per-feed schedule
+# ---------------------------------------------------------------------------
+# Every feed gets its own next_fetch. The interval is learned from the gaps
+# between the feed's stored `published` times, capped at ACTIVE_INTERVAL
+# (close to the old fixed 30 min) while the feed posted within QUIET_AFTER,
+# is never shorter than what the publisher asks for (RSS <ttl>,
+# sy:updatePeriod, Cache-Control max-age), doubles with each consecutive
+# error, and is jittered so feeds drift apart instead of all coming due on
+# the same tick; a feed's first next_fetch is spread over its whole interval,
+# since every new feed is fetched on the same first tick. The RSS source only
+# needs to tick often (see sources.py); feeds that aren't due cost nothing.
+
+MIN_INTERVAL = 15 * 60          # seconds; never poll a feed more often
+MAX_INTERVAL = 24 * 3600        # …or less often than this
+ACTIVE_INTERVAL = 60 * 60       # longest learned interval for an active feed
+QUIET_AFTER = 7 * 86400         # no post for this long: the feed is quiet
+DEFAULT_INTERVAL = 30 * 60      # until a feed has enough history to learn from
+CADENCE_SAMPLE = 20             # most recent items used to learn the cadence
+CADENCE_FACTOR = 0.25           # poll ~4× per typical gap between posts
+SCHEDULE_JITTER = 0.1           # ± fraction of the interval
+
+SY_PERIODS = {
+    "hourly": 3600,
+    "daily": 86400,
+    "weekly": 7 * 86400,
+    "monthly": 30 * 86400,
+    "yearly": 365 * 86400,
+}
+MAX_AGE_RE = re.compile(r"(?:^|,)\s*max-age\s*=\s*\"?(\d+)", re.I)
+
+
+def _max_age(cache_control: Optional[str]) -> Optional[float]:
+    """Seconds from a Cache-Control header's max-age, if any."""
+    if not cache_control or "no-cache" in cache_control or "no-store" in cache_control:
+        return None
+    m = MAX_AGE_RE.search(cache_control)
+    return float(m.group(1)) if m else None
+
+
+def _feed_hint(feed) -> Optional[float]:
+    """Minimum polling interval the feed asks for via <ttl> or sy:update*."""
+    hints = []
+    try:
+        ttl = feed.get("ttl")
+        if ttl:
+            hints.append(float(ttl) * 60)   # minutes
+        period = SY_PERIODS.get((feed.get("sy_updateperiod") or "").strip().lower())
+        if period:
+            frequency = float(feed.get("sy_updatefrequency") or 1)
+            hints.append(period / max(frequency, 1))
+    except (TypeError, ValueError):
+        pass
+    return max(hints) if hints else None
+
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value)).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def _learned_interval(db: sqlite3.Connection, source: str, now: datetime) -> float:
+    """Polling interval from the typical gap between the feed's posts.
+
+    The open gap since the newest post counts as one more sample, so a
+    feed that has gone quiet is gradually polled less often; only quiet
+    feeds go past ACTIVE_INTERVAL.
+    """
+    times = [
+        t for t in (
+            _parse_timestamp(row[0]) for row in db.execute(
+                "SELECT published FROM articles WHERE source = ? AND published IS NOT NULL "
+                "ORDER BY published DESC LIMIT ?",
+                (source, CADENCE_SAMPLE),
+            )
+        ) if t is not None
+    ]
+    if len(times) < 2:
+        return DEFAULT_INTERVAL
+    gaps = [(a - b).total_seconds() for a, b in zip([now] + times, times)]
+    gaps = [g for g in gaps if g > 0]
+    if not gaps:
+        return DEFAULT_INTERVAL
+    interval = statistics.median(gaps) * CADENCE_FACTOR
+    if (now - times[0]).total_seconds() < QUIET_AFTER:
+        interval = min(interval, ACTIVE_INTERVAL)
+    return interval
+
+
+def _next_schedule(db: sqlite3.Connection, source: str, failed: bool,
+                   hint: Optional[float], prev: Optional[dict], now: datetime) -> tuple:
+    """(error_count, hint_seconds, interval_seconds, next_fetch) after a fetch."""
+    prev = prev or {}
+    if hint is None:
+        hint = prev.get("hint_seconds")
+    if failed:
+        errors = (prev.get("error_count") or 0) + 1
+        interval = MIN_INTERVAL * 2 ** min(errors - 1, 16)
+    else:
+        errors = 0
+        interval = max(_learned_interval(db, source, now), hint or 0)
+    interval = min(max(interval, MIN_INTERVAL), MAX_INTERVAL)
+    if prev.get("next_fetch") is None:
+        # First schedule: stagger feeds that were all fetched together
+        jittered = interval * random.uniform(SCHEDULE_JITTER, 1)
+    else:
+        jittered = interval * random.uniform(1 - SCHEDULE_JITTER, 1 + SCHEDULE_JITTER)
+    return errors, hint, interval, now + timedelta(seconds=jittered)
+
+
+def _is_due(st: Optional[dict], now: datetime) -> bool:
+    next_fetch = _parse_timestamp(st["next_fetch"]) if st and st.get("next_fetch") else None
+    return next_fetch is None or next_fetch <= now
+
+# ---------------------------------------------------------------------------
+# Entry dedup – skip entries whose content has not changed
+# ---------------------------------------------------------------------------
+
+def _entry_hash(title: str, raw_html: str, ts) -> str:
+    """Fingerprint of everything an entry's stored row is derived from."""
+    stamp = repr(tuple(ts[:6])) if ts else ""
+    return hashlib.sha1(
+        "\0".join((title, stamp, raw_html)).encode("utf-8", "surrogatepass")
+    ).hexdigest()
+
+
+def _known_hashes(db: sqlite3.Connection, source: str) -> dict:
+    """link → content_hash for every article stored for *source*."""
+    return dict(db.execute(
+        "SELECT link, content_hash FROM articles WHERE source = ?", (source,)
+    ).fetchall())
+
+# ---------------------------------------------------------------------------
+# Parse stage – CPU only, runs in worker processes
+# ---------------------------------------------------------------------------
+
+class ParsedEntry(NamedTuple):
+    source: str
+    title: str
+    link: str
+    published: Optional[datetime]   # None when the feed gives no date
+    summary: str
+    content_hash: str
+    is_update: bool                 # link already stored, content changed
+
+
+class ParseResult(NamedTuple):
+    source: str
+    entries: list                   # [ParsedEntry] that need writing
+    total: int                      # entries in the feed, incl. unchanged
+    error: Optional[str]
+    hint: Optional[float] = None    # publisher's <ttl>/sy:updatePeriod, seconds
+    parse_seconds: float = 0.0      # whole _parse_feed call…
+    strip_seconds: float = 0.0      # …of which HTML → snippet
+
+
+def _parse_feed(src: str, content: bytes, known: dict) -> ParseResult:
+    """Parse one feed body into ParsedEntry rows.
+
+    *known* maps already-stored links to their content hash; entries whose
+    hash matches are dropped before any HTML work. Runs in a worker process,
+    so it takes and returns only plain picklable data.
+    """
+    known = dict(known)  # entries repeated within the feed get added below
+    started = time.perf_counter()
+    strip_seconds = 0.0
+    try:
+        d = feedparser.parse(content)
+        entries = []
+        for e in d.entries:
+            # broader timestamp support
+            ts = (
+                e.get("published_parsed")
+                or e.get("updated_parsed")
+                or e.get("dc_date")
+                or e.get("created_parsed")
+            )
+
+            # Prefer full content (Ghost) then summary
+            if e.get("content"):
+                raw_html = e.content[0].value
+            else:
+                raw_html = e.get("summary", "")
+
+            title = e.get("title", "").strip()
+            entry_hash = _entry_hash(title, raw_html, ts)
+            if e.link in known and known[e.link] == entry_hash:
+                continue
+
+            strip_started = time.perf_counter()
+            snippet = _html_snippet(raw_html)
+            strip_seconds += time.perf_counter() - strip_started
+            entries.append(ParsedEntry(
+                src, title, e.link,
+                datetime(*ts[:6]) if ts else None,
+                snippet,
+                entry_hash,
+                e.link in known,
+            ))
+            known[e.link] = entry_hash
+        return ParseResult(src, entries, len(d.entries), None, _feed_hint(d.feed),
+                           time.perf_counter() - started, strip_seconds)
+    except Exception as exc:
+        logging.debug(traceback.format_exc())
+        return ParseResult(src, [], 0, str(exc), None, time.perf_counter() - started, strip_seconds)
+
+
+def parse_feeds(jobs: list) -> list:
+    """Run `_parse_feed` over *jobs* (``(source, content, known)`` tuples).
+
+    Uses a ProcessPoolExecutor when the bodies add up to at least
+    PARSE_POOL_MIN_BYTES, otherwise (or if no pool can be started, e.g. on
+    platforms without working semaphores) parses inline. Results keep the
+    order of *jobs*.
+    """
+    total_bytes = sum(len(content) for _, content, _ in jobs)
+    if PARSE_WORKERS > 1 and len(jobs) > 1 and total_bytes >= PARSE_POOL_MIN_BYTES:
+        try:
+            with ProcessPoolExecutor(max_workers=min(PARSE_WORKERS, len(jobs)),
+                                     mp_context=PARSE_POOL_CONTEXT) as pool:
+                # Largest first so one huge feed doesn't start last
+                order = sorted(range(len(jobs)), key=lambda i: -len(jobs[i][1]))
+                futures = {i: pool.submit(_parse_feed, *jobs[i]) for i in order}
+                return [futures[i].result() for i in range(len(jobs))]
+        except (OSError, NotImplementedError, RuntimeError) as exc:
+            # BrokenProcessPool is a RuntimeError
+            logging.warning("⚠️  parse pool unavailable (%s); parsing inline", exc)
+    return [_parse_feed(*job) for job in jobs]
+
 # ---------------------------------------------------------------------------
 # Core logic
 # ---------------------------------------------------------------------------
 
-def refresh_feeds(db_path: str, keep_latest: int = 1000) -> None:
-    """Fetch all feeds and update *db_path* SQLite database.
+def refresh_feeds(db_path: str, keep_latest: int = 1000,
+                  feeds: Optional[dict[str, str]] = None, due_only: bool = True,
+                  force: bool = False) -> bool:
+    """Fetch the feeds that are due and update *db_path* SQLite database.
 
-    Creates the `articles` table if it does not yet exist and keeps only the
-    *keep_latest* most–recent articles overall.
+    Creates/migrates the `articles` table (see db.ensure_schema) and keeps
+    only the *keep_latest* most–recent feed articles overall. *feeds*
+    defaults to FEEDS (source adapters pass their own mapping). Without
+    *due_only* every feed is fetched regardless of its schedule, still with
+    conditional GETs; *force* also ignores the validators and stored body
+    hash, so every feed is downloaded and re-parsed in full. Returns whether any article was
+    added, updated or pruned.
     """
+    if feeds is None:
+        feeds = FEEDS
 
     logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
-    with sqlite3.connect(db_path) as db:
-        db.execute(
-            """CREATE TABLE IF NOT EXISTS articles(
-                id INTEGER PRIMARY KEY,
-                source TEXT,
-                title TEXT,
-                link TEXT UNIQUE,
-                published DATETIME,
-                summary TEXT
-            )"""
-        )
+    with writer(db_path) as db:
+        state = _load_fetch_state(db)
 
-        for src, url in FEEDS.items():
-            try:
-                resp = requests.get(
-                    url,
-                    timeout=10,
-                    headers={"User-Agent": "Mozilla/5.0 (compatible; InterestingFeeds/1.0)"},
-                )
-                resp.raise_for_status()
-                d = feedparser.parse(resp.content)
-
-                if not d.entries:
-                    logging.warning("⚠️  %s: nothing parsed from %s", src, url)
-                    continue
-
-                for e in d.entries:
-                    # broader timestamp support
-                    ts = (
-                        e.get("published_parsed")
-                        or e.get("updated_parsed")
-                        or e.get("dc_date")
-                        or e.get("created_parsed")
-                    )
-                    dt = datetime(*ts[:6]) if ts else datetime.utcnow()
+    # Only reuse validators while the source still points at the same URL
+    state = {src: st for src, st in state.items() if feeds.get(src) == st["url"]}
 
-                    # Prefer full content (Ghost) then summary
-                    if e.get("content"):
-                        raw_html = e.content[0].value
-                    else:
-                        raw_html = e.get("summary", "")
+    now = datetime.utcnow()
+    due = {src: url for src, url in feeds.items()
+           if force or not due_only or _is_due(state.get(src), now)}
+    if not due:
+        logging.info("⏭️  No feeds due (%d scheduled for later)", len(feeds))
+        return False
+    logging.info("📡 Fetching %d of %d feeds", len(due), len(feeds))
 
-                    plain = _html_to_text(raw_html)
-                    summary = (
-                        plain[:SNIPPET_CHARS] + "…" if len(plain) > SNIPPET_CHARS else plain
-                    )
+    # 1) network: fetch the due feeds concurrently before touching the DB
+    with REFRESH_PHASE_SECONDS.time(kind=KIND_RSS, phase="fetch"):
+        fetch_started = time.perf_counter()
+        results = fetch_feeds(due, {} if force else state)
+        fetch_seconds = time.perf_counter() - fetch_started
+
+    # Per-feed numbers for metrics and refresh_history
+    history = {}
+    for res in results:
+        history[res.source] = {
+            "status": "error" if res.error else "not_modified" if res.not_modified else "ok",
+            "fetch_seconds": res.duration,
+            "bytes": len(res.content) if res.content is not None else 0,
+            "error": res.error,
+        }
+        FEED_FETCH_SECONDS.observe(res.duration, feed=res.source)
+        FEED_BYTES.inc(history[res.source]["bytes"], feed=res.source)
+
+    # 2) parse (process pool for big refreshes) outside any transaction;
+    #    known hashes come from a pooled read connection
+    pending, skipped = [], []
+    failed, hints = set(), {}
+    for res in results:
+        src, url = res.source, res.url
+        prev = state.get(src)
+        if res.error:
+            logging.error("RSS error for %s → %s", url, res.error)
+            failed.add(src)
+            skipped.append((res, None))
+            continue
+        if res.not_modified:
+            skipped.append((res, None))
+            continue
+
+        content_hash = hashlib.sha256(res.content).hexdigest()
+        if not force and prev and prev.get("content_hash") == content_hash:
+            # Server ignored the validators but the body is identical
+            history[src]["status"] = "unchanged"
+            skipped.append((res, content_hash))
+            continue
+        pending.append((res, content_hash))
 
-                    db.execute(
+    # In steady state nearly every entry is already stored with the same
+    # hash and is skipped by the parser before any HTML work.
+    parse_started = time.perf_counter()
+    with reader(db_path) as db:
+        jobs = [(res.source, res.content, _known_hashes(db, res.source)) for res, _ in pending]
+    parsed = parse_feeds(jobs)
+    parse_seconds = time.perf_counter() - parse_started
+    strip_seconds = sum(result.strip_seconds for result in parsed)
+    if pending:
+        REFRESH_PHASE_SECONDS.observe(parse_seconds, kind=KIND_RSS, phase="parse")
+        # CPU time summed over worker processes, not wall time
+        REFRESH_PHASE_SECONDS.observe(strip_seconds, kind=KIND_RSS, phase="html_strip")
+
+    # 3) write everything as one short batched transaction
+    with writer(db_path) as db, BulkWriter(db) as bulk:
+        for res, content_hash in skipped:
+            _save_fetch_state(bulk, res, state.get(res.source), content_hash)
+
+        write_started = time.perf_counter()
+        for (res, content_hash), result in zip(pending, parsed):
+            row = history[res.source]
+            row.update(parse_seconds=result.parse_seconds, strip_seconds=result.strip_seconds)
+            if result.error:
+                logging.error("RSS error for %s → %s", res.url, result.error)
+                failed.add(res.source)
+                row.update(status="error", error=result.error)
+                continue
+            if not result.total:
+                logging.warning("⚠️  %s: nothing parsed from %s", res.source, res.url)
+                failed.add(res.source)
+                row.update(status="error", error="nothing parsed")
+                continue
+            hints[res.source] = result.hint
+            updated = sum(entry.is_update for entry in result.entries)
+            row.update(new_items=len(result.entries) - updated, updated_items=updated,
+                       unchanged_items=result.total - len(result.entries))
+
+            for entry in result.entries:
+                if entry.is_update:
+                    # Content changed: update in place; keep the stored
+                    # date unless the feed actually provides one
+                    bulk.add(
+                        """UPDATE articles
+                            SET title = ?, published = COALESCE(?, published),
+                                summary = ?, content_hash = ?
+                            WHERE link = ?""",
+                        (entry.title, entry.published, entry.summary,
+                         entry.content_hash, entry.link),
+                    )
+                else:
+                    bulk.add(
                         """INSERT OR IGNORE INTO articles
-                            (source, title, link, published, summary)
-                            VALUES (?,?,?,?,?)""",
-                        (src, e.get("title", "").strip(), e.link, dt, summary),
+                            (source, title, link, published, summary, content_hash)
+                            VALUES (?,?,?,?,?,?)""",
+                        (entry.source, entry.title, entry.link,
+                         entry.published or datetime.utcnow(),
+                         entry.summary, entry.content_hash),
                     )
-            except Exception as exc:
-                logging.error("RSS error for %s → %s", url, exc)
-                logging.debug(traceback.format_exc())
-
-        # Keep only the latest N items
-        db.execute(
-            "DELETE FROM articles WHERE id NOT IN (SELECT id FROM articles ORDER BY published DESC LIMIT ?)",
-            (keep_latest,),
+            # Only remember the hash once the body was fully ingested
+            _save_fetch_state(bulk, res, state.get(res.source), content_hash)
+
+        # Schedule each fetched feed's next visit; runs after the flush so
+        # the cadence sees the entries just written
+        bulk.flush()
+        for res in results:
+            feed_hints = [h for h in (res.max_age, hints.get(res.source)) if h]
+            errors, hint, interval, next_fetch = _next_schedule(
+                db, res.source, res.source in failed,
+                min(max(feed_hints), MAX_INTERVAL) if feed_hints else None,
+                state.get(res.source), now,
+            )
+            bulk.add(
+                """INSERT INTO feed_fetch_state
+                    (source, url, error_count, hint_seconds, interval_seconds, next_fetch)
+                    VALUES (?,?,?,?,?,?)
+                    ON CONFLICT(source) DO UPDATE SET
+                        error_count = excluded.error_count,
+                        hint_seconds = excluded.hint_seconds,
+                        interval_seconds = excluded.interval_seconds,
+                        next_fetch = excluded.next_fetch""",
+                (res.source, res.url, errors, hint, interval, next_fetch),
+            )
+
+        for src, row in history.items():
+            FEED_FETCHES.inc(feed=src, result=row["status"])
+            for status in ("new", "updated", "unchanged"):
+                if row.get(f"{status}_items"):
+                    FEED_ENTRIES.inc(row[f"{status}_items"], feed=src, status=status)
+            add_history(bulk, started_at=now, kind=KIND_RSS, source=src, **row)
+        # One summary row (source "*") per refresh with each phase's wall time
+        totals = {
+            column: sum(row.get(column) or 0 for row in history.values())
+            for column in ("bytes", "new_items", "updated_items", "unchanged_items")
+        }
+        add_history(
+            bulk, started_at=now, kind=KIND_RSS, source="*",
+            status="error" if failed else "ok",
+            fetch_seconds=fetch_seconds, parse_seconds=parse_seconds, strip_seconds=strip_seconds,
+            write_seconds=time.perf_counter() - write_started, **totals,
         )
-        db.commit()
+        prune_history(db)
+
+        # Keep only the latest N items. Local file rows are owned by
+        # local_files.py (which only rewrites what changed), so leave them be.
+        pruned = db.execute(
+            """DELETE FROM articles
+               WHERE kind != ?
+                 AND id NOT IN (
+                     SELECT id FROM articles WHERE kind != ?
+                     ORDER BY published DESC LIMIT ?
+                 )""",
+            (KIND_LOCAL_FILE, KIND_LOCAL_FILE, keep_latest),
+        ).rowcount
+    REFRESH_PHASE_SECONDS.observe(time.perf_counter() - write_started, kind=KIND_RSS, phase="db_write")
+    return bool(totals["new_items"] or totals["updated_items"] or pruned)
 
 
 # ---------------------------------------------------------------------------
@@ -137,7 +851,7 @@ def refresh_feeds(db_path: str, keep_latest: int = 1000) -> None:
 if __name__ == "__main__":
     ROOT_DIR = os.path.dirname(os.path.realpath(__file__))
     DB_PATH = os.path.join(ROOT_DIR, "content.db")
-    refresh_feeds(DB_PATH)
+    refresh_feeds(DB_PATH, due_only=False, force="--force" in sys.argv[1:])
     
     # Also refresh local files
     try:
@@ -1,91 +1,147 @@
 #!/usr/bin/env python3
 """
 Import Onebird.net data into content.db
-Usage: python backend/import_onebird.py path/to/onebird.sqlite
+Usage: python backend/import_onebird.py path/to/onebird.sqlite [--full]
+
+onebird.sqlite is ATTACHed to content.db and copied with INSERT … SELECT in
+rowid chunks, so post bodies never pass through Python. Each chunk commits
+together with a high-water mark (the last imported posts.rowid), so an
+interrupted import resumes where it stopped and re-runs only pick up new
+posts. `--full` ignores the checkpoint and rescans everything.
 """
 import sys
 import sqlite3
 import os
+import time
 from datetime import datetime
 
-def import_onebird_data(onebird_db_path: str, content_db_path: str):
-    """Import data from onebird.sqlite into content.db"""
-    
+from db import BATCH_SIZE, checkpoint, connect, ensure_schema, write_lock
+from snapshot import export_snapshot
+
+SOURCE = "onebird"
+SUMMARY_CHARS = 280
+
+
+def _load_high_water(conn: sqlite3.Connection) -> int:
+    row = conn.execute(
+        "SELECT high_water FROM import_state WHERE source = ?", (SOURCE,)
+    ).fetchone()
+    if row and not conn.execute(
+        "SELECT 1 FROM articles WHERE source = ? LIMIT 1", (SOURCE,)
+    ).fetchone():
+        # Imported rows are all gone (clean_db, the keep_latest prune):
+        # the checkpoint no longer describes the table, so start over
+        return 0
+    return row[0] if row else 0
+
+
+def import_onebird_data(onebird_db_path: str, content_db_path: str,
+                        chunk_size: int = BATCH_SIZE, full: bool = False):
+    """Import data from onebird.sqlite into content.db, chunk by chunk"""
+
     if not os.path.exists(onebird_db_path):
         print(f"❌ Onebird database not found: {onebird_db_path}")
         return
-    
+
     print(f"📥 Importing from: {onebird_db_path}")
     print(f"📤 Importing to: {content_db_path}")
-    
-    # Connect to both databases
-    onebird_conn = sqlite3.connect(onebird_db_path)
-    content_conn = sqlite3.connect(content_db_path)
-    
+
+    content_conn = connect(content_db_path)
+
     try:
-        # First, let's see what tables exist in onebird.sqlite
-        cursor = onebird_conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
-        print(f"📋 Tables in onebird.sqlite: {[t[0] for t in tables]}")
-        
-        # Query the onebird posts table
-        cursor.execute("SELECT title_tc, url, content_tc, date FROM posts ORDER BY date DESC")
-        rows = cursor.fetchall()
-        
-        if not rows:
-            print("⚠️  No posts found in onebird.sqlite")
+        with write_lock(content_db_path):
+            ensure_schema(content_conn)
+            content_conn.commit()
+        content_conn.execute("ATTACH DATABASE ? AS onebird", (onebird_db_path,))
+
+        tables = [r[0] for r in content_conn.execute(
+            "SELECT name FROM onebird.sqlite_master WHERE type='table'"
+        )]
+        print(f"📋 Tables in onebird.sqlite: {tables}")
+        if "posts" not in tables:
+            print("⚠️  No posts table in onebird.sqlite")
             return
-        
-        print(f"📋 Found {len(rows)} posts to import")
-        
-        # Import into content.db
-        content_cursor = content_conn.cursor()
-        imported_count = 0
-        
-        for row in rows:
-            title_tc, url, content_tc, date = row
-            
-            # Skip if any required field is empty
-            if not title_tc or not url:
-                continue
-                
-            # Convert content to summary (truncate to 280 chars)
-            content_text = content_tc or ""
-            summary = content_text[:280] + "..." if len(content_text) > 280 else content_text
-            
-            # Convert date format if needed (onebird uses TEXT, content.db expects DATETIME)
-            # Assuming date is in a reasonable format, SQLite will handle the conversion
-            published_date = date or datetime.now().isoformat()
-            
-            try:
-                content_cursor.execute(
-                    "INSERT OR IGNORE INTO articles (source, title, link, published, summary) VALUES (?, ?, ?, ?, ?)",
-                    ("onebird", title_tc, url, published_date, summary)
+
+        high_water = 0 if full else _load_high_water(content_conn)
+        pending = content_conn.execute(
+            "SELECT COUNT(*) FROM onebird.posts WHERE rowid > ?", (high_water,)
+        ).fetchone()[0]
+        if not pending:
+            print("✅ Onebird already up to date" if high_water else "⚠️  No posts found in onebird.sqlite")
+            return
+        print(f"📋 Found {pending} posts to import (after rowid {high_water})")
+
+        # Rows missing a title or url are skipped; the summary is the first
+        # SUMMARY_CHARS characters of content_tc, plus "..." if it was cut.
+        insert_sql = f"""
+            INSERT OR IGNORE INTO articles (source, title, link, published, summary)
+            SELECT ?, title_tc, url, COALESCE(NULLIF(date, ''), ?),
+                   CASE WHEN length(content_tc) > {SUMMARY_CHARS}
+                        THEN substr(content_tc, 1, {SUMMARY_CHARS}) || '...'
+                        ELSE COALESCE(content_tc, '') END
+            FROM onebird.posts
+            WHERE rowid > ? AND rowid <= ?
+              AND title_tc IS NOT NULL AND title_tc != ''
+              AND url IS NOT NULL AND url != ''
+        """
+        scanned = imported = 0
+        started = time.perf_counter()
+
+        while True:
+            # Upper rowid of the next chunk, walked on the rowid b-tree
+            upper, count = content_conn.execute(
+                """SELECT MAX(rowid), COUNT(*) FROM (
+                       SELECT rowid FROM onebird.posts WHERE rowid > ? ORDER BY rowid LIMIT ?
+                   )""",
+                (high_water, chunk_size),
+            ).fetchone()
+            if not count:
+                break
+
+            # One transaction per chunk: the rows and the checkpoint commit
+            # together, and other writers (parallel sources) get the lock in
+            # between chunks
+            with write_lock(content_db_path), content_conn:
+                content_conn.execute("BEGIN IMMEDIATE")
+                cursor = content_conn.execute(
+                    insert_sql, (SOURCE, datetime.now().isoformat(), high_water, upper)
+                )
+                imported += cursor.rowcount
+                content_conn.execute(
+                    """INSERT INTO import_state (source, high_water, updated_at) VALUES (?, ?, ?)
+                       ON CONFLICT(source) DO UPDATE
+                       SET high_water = excluded.high_water, updated_at = excluded.updated_at""",
+                    (SOURCE, upper, datetime.now().isoformat()),
                 )
-                imported_count += 1
-            except Exception as e:
-                print(f"⚠️  Skipped article '{title_tc}': {e}")
-        
-        content_conn.commit()
-        print(f"✅ Imported {imported_count} articles from Onebird")
-        
+            high_water = upper
+            scanned += count
+
+            elapsed = time.perf_counter() - started
+            print(f"   … {scanned}/{pending} posts scanned, {imported} imported "
+                  f"({scanned / elapsed:,.0f} posts/s)")
+
+        elapsed = time.perf_counter() - started
+        print(f"✅ Imported {imported} articles from Onebird "
+              f"({scanned} posts in {elapsed:.1f}s, {scanned / elapsed:,.0f} posts/s)")
+
     except Exception as e:
         print(f"❌ Error importing data: {e}")
     finally:
-        onebird_conn.close()
         content_conn.close()
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python import_onebird.py path/to/onebird.sqlite")
+    args = [a for a in sys.argv[1:] if a != "--full"]
+    if len(args) != 1:
+        print("Usage: python import_onebird.py path/to/onebird.sqlite [--full]")
         sys.exit(1)
-    
-    onebird_db_path = sys.argv[1]
+
+    onebird_db_path = args[0]
     script_dir = os.path.dirname(os.path.realpath(__file__))
     content_db_path = os.path.join(script_dir, "content.db")
-    
-    import_onebird_data(onebird_db_path, content_db_path)
+
+    import_onebird_data(onebird_db_path, content_db_path, full="--full" in sys.argv[1:])
+    export_snapshot(content_db_path)
+    checkpoint(content_db_path)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
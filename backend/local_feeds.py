@@ -8,6 +8,8 @@ import os
 from datetime import datetime
 from typing import Dict, List, Tuple
 
+from db import BulkWriter, writer
+
 def get_local_sources() -> Dict[str, str]:
     """Define local data sources"""
     return {
@@ -35,39 +37,42 @@ def fetch_onebird_articles(db_path: str, limit: int = 50) -> List[Tuple]:
             print(f"⚠️  Onebird table schema error: {e}")
             return []
 
-def refresh_local_sources(content_db_path: str):
-    """Add local sources to the main content database"""
-    local_sources = get_local_sources()
+def refresh_local_sources(content_db_path: str, local_sources: Dict[str, str] = None) -> bool:
+    """Add local sources to the main content database; True if any row was new"""
+    if local_sources is None:
+        local_sources = get_local_sources()
     
-    with sqlite3.connect(content_db_path) as conn:
-        for source_name, source_path in local_sources.items():
-            if source_name == "onebird":
-                articles = fetch_onebird_articles(source_path)
+    changed = False
+    for source_name, source_path in local_sources.items():
+        if source_name != "onebird":
+            continue
+        # Read the dump first; only the inserts run under the writer
+        articles = fetch_onebird_articles(source_path)
+        with writer(content_db_path) as conn:
+            before = conn.total_changes
+            with BulkWriter(conn) as bulk:
                 for article in articles:
                     title_tc, url, content_tc, date = article
                     # Skip if any required field is empty
                     if not title_tc or not url:
                         continue
-                        
+                    
                     # Convert content to summary (match existing format)
                     content_text = content_tc or ""
                     summary = content_text[:280] + "..." if len(content_text) > 280 else content_text
-                    
-                    conn.execute(
+                
+                    bulk.add(
                         """INSERT OR IGNORE INTO articles 
                            (source, title, link, published, summary) 
                            VALUES (?, ?, ?, ?, ?)""",
                         (source_name, title_tc, url, date, summary)
                     )
-        conn.commit()
+            changed = conn.total_changes > before or changed
+    return changed
 
-# Integration with existing feeds.py
+# Integration with the source registry (sources.py)
 def refresh_all_feeds(db_path: str):
-    """Refresh both RSS feeds and local sources"""
-    # Import and call existing refresh_feeds
-    from feeds import refresh_feeds
-    refresh_feeds(db_path)
-    
-    # Add local sources
-    refresh_local_sources(db_path)
+    """Refresh every configured source (RSS, local files, local DBs) in parallel"""
+    from sources import refresh_all
+    refresh_all(db_path)
     print("✅ Refreshed RSS feeds and local sources") 
\ No newline at end of file
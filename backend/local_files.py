@@ -6,11 +6,16 @@ Scans local directories for PDFs, EPUBs, and other documents
 import os
 import sqlite3
 import mimetypes
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import List, Tuple, Dict
 import hashlib
 
+from db import (FILE_LINK_PREFIX, KIND_LOCAL_FILE, LOCAL_FILE_SUFFIX, MAX_SQL_PARAMS, BulkWriter,
+                add_history, prune_history, reader, writer)
+from metrics import LOCAL_FILES, REFRESH_PHASE_SECONDS
+
 # Directories to scan for files - Add more folders here
 LOCAL_FILES_DIRS = {
     "Research Papers": "/Users/brandonpai/Desktop/Research paper",
@@ -22,13 +27,50 @@ LOCAL_FILES_DIRS = {
 # Supported file types
 SUPPORTED_EXTENSIONS = {'.pdf', '.epub', '.docx', '.doc', '.txt', '.md'}
 
-def get_file_hash(file_path: str) -> str:
-    """Generate a hash for the file to use as unique identifier"""
-    return hashlib.md5(file_path.encode()).hexdigest()
+# Content fingerprint: the file size plus its first and last SAMPLE_BYTES,
+# so hashing a multi-GB book reads 128 KiB, not the whole file
+SAMPLE_BYTES = 64 * 1024
+
+def _stat_key(stat: os.stat_result) -> Tuple:
+    return (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+# (device, inode, mtime_ns, size) → fingerprint, from the DB and the last
+# scan; a file that wasn't touched (renames and moves included) is never
+# read again
+_fingerprints: Dict[Tuple, str] = {}
+
+# fingerprint → paths of identical copies other than the stored one, from
+# the last scan; watch mode promotes one of them when the stored copy goes
+_duplicates: Dict[str, set] = {}
+
+def get_file_hash(file_path: str, stat: os.stat_result = None) -> str:
+    """Content fingerprint used as the file's identifier
+
+    Stays the same when a file is renamed or moved, and identical copies
+    share it. Cached by inode and mtime.
+    """
+    if stat is None:
+        stat = os.stat(file_path)
+    key = _stat_key(stat)
+    fingerprint = _fingerprints.get(key)
+    if fingerprint is None:
+        digest = hashlib.blake2b(str(stat.st_size).encode(), digest_size=16)
+        with open(file_path, "rb") as f:
+            digest.update(f.read(SAMPLE_BYTES))
+            if stat.st_size > SAMPLE_BYTES:
+                f.seek(max(stat.st_size - SAMPLE_BYTES, SAMPLE_BYTES))
+                digest.update(f.read(SAMPLE_BYTES))
+        fingerprint = _fingerprints[key] = digest.hexdigest()
+    return fingerprint
 
-def get_file_metadata(file_path: Path, folder_name: str) -> Dict:
-    """Extract metadata from a file"""
-    stat = file_path.stat()
+def get_file_metadata(file_path: Path, folder_name: str, stat: os.stat_result = None) -> Dict:
+    """Extract metadata from a file
+
+    Pass *stat* when it is already known (e.g. from `os.scandir`) to avoid a
+    second `stat()` call per file.
+    """
+    if stat is None:
+        stat = file_path.stat()
     
     # Use filename as title, remove extension
     title = file_path.stem
@@ -49,7 +91,8 @@ def get_file_metadata(file_path: Path, folder_name: str) -> Dict:
     return {
         'title': title,
         'file_path': str(file_path.absolute()),
-        'file_hash': get_file_hash(str(file_path.absolute())),
+        'file_hash': get_file_hash(str(file_path.absolute()), stat),
+        'stat_key': _stat_key(stat),
         'summary': summary,
         'modified_time': modified_time,
         'file_size': file_size,
@@ -57,6 +100,31 @@ def get_file_metadata(file_path: Path, folder_name: str) -> Dict:
         'folder_name': folder_name
     }
 
+def _iter_supported_files(directory: str):
+    """Yield (path, stat) for every supported file below *directory*.
+
+    Uses `os.scandir`, whose entries carry the file type and cache their
+    stat result, so each file costs at most one stat call.
+    """
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = os.scandir(current)
+        except OSError as e:
+            print(f"⚠️  Cannot read {current}: {e}")
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        stack.append(entry.path)
+                    elif (os.path.splitext(entry.name)[1].lower() in SUPPORTED_EXTENSIONS
+                          and entry.is_file()):
+                        yield entry.path, entry.stat()
+                except OSError as e:
+                    print(f"⚠️  Error processing {entry.path}: {e}")
+
 def scan_local_files(directory: str, folder_name: str) -> List[Dict]:
     """Scan directory for supported files and return metadata"""
     if not os.path.exists(directory):
@@ -64,103 +132,388 @@ def scan_local_files(directory: str, folder_name: str) -> List[Dict]:
         return []
     
     files = []
-    directory_path = Path(directory)
-    
-    for file_path in directory_path.rglob('*'):
-        if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS:
-            try:
-                metadata = get_file_metadata(file_path, folder_name)
-                files.append(metadata)
-            except Exception as e:
-                print(f"⚠️  Error processing {file_path}: {e}")
+    for path, stat in _iter_supported_files(os.path.abspath(directory)):
+        try:
+            files.append(get_file_metadata(Path(path), folder_name, stat))
+        except Exception as e:
+            print(f"⚠️  Error processing {path}: {e}")
     
     return files
 
-def refresh_local_files(content_db_path: str):
-    """Scan local files from all directories and update the database"""
+LOCAL_FILE_COLUMNS = ("file_hash", "file_path", "title", "file_type", "file_size",
+                      "modified_time", "folder_name", "device", "inode", "mtime_ns")
+
+def _local_file_row(f: Dict) -> Tuple:
+    # Same shape and types as a LOCAL_FILE_COLUMNS row read back from the DB
+    device, inode, mtime_ns, _ = f['stat_key']
+    return (
+        f['file_hash'],
+        f['file_path'],
+        f['title'],
+        f['file_type'],
+        f['file_size'],
+        str(f['modified_time']),
+        f['folder_name'],
+        device,
+        inode,
+        mtime_ns
+    )
+
+def _load_fingerprints(content_db_path: str) -> Dict[str, str]:
+    """Seed the fingerprint cache from local_files; returns file_hash → stored path"""
+    try:
+        with reader(content_db_path) as conn:
+            rows = conn.execute(
+                "SELECT file_hash, file_path, device, inode, mtime_ns, file_size FROM local_files"
+            ).fetchall()
+    except (FileNotFoundError, sqlite3.OperationalError):
+        # First scan, or a table from before the fingerprint columns
+        return {}
+    for file_hash, _, device, inode, mtime_ns, size in rows:
+        if inode is not None:
+            _fingerprints.setdefault((device, inode, mtime_ns, size), file_hash)
+    return {file_hash: file_path for file_hash, file_path, *_ in rows}
+
+def _article_row(f: Dict, extracted: Dict[str, Tuple]) -> Tuple:
+    # Source name like "Research Papers(local file)" and a special URL
+    # format that our backend can handle
+    title, summary = f['title'], f['summary']
+    text = extracted.get(f['file_hash'])
+    if text and text[:2] == (f['file_size'], str(f['modified_time'])):
+        # Extracted text still matches the file (see extract.py)
+        title, summary = text[2] or title, text[3]
+    return (
+        f"{f['folder_name']}{LOCAL_FILE_SUFFIX}",
+        title,
+        FILE_LINK_PREFIX + f['file_hash'],
+        f['modified_time'],
+        summary,
+        KIND_LOCAL_FILE
+    )
+
+def _load_extracted(conn: sqlite3.Connection) -> Dict[str, Tuple]:
+    return {
+        row[0]: row[1:] for row in conn.execute(
+            "SELECT file_hash, file_size, modified_time, title, summary "
+            "FROM local_file_text WHERE summary IS NOT NULL"
+        )
+    }
+
+def _write_changes(bulk: BulkWriter, upserts: List[Dict], removed: List[str],
+                   extracted: Dict[str, Tuple]):
+    """Queue the local_files/articles writes for new or changed files and removed hashes"""
+    bulk.add_many(
+        "DELETE FROM articles WHERE link = ?",
+        ((FILE_LINK_PREFIX + h,) for h in removed),
+    )
+    bulk.add_many(
+        "DELETE FROM local_files WHERE file_hash = ?",
+        ((h,) for h in removed),
+    )
+    bulk.add_many(
+        "DELETE FROM articles WHERE link = ?",
+        ((FILE_LINK_PREFIX + f['file_hash'],) for f in upserts),
+    )
+    bulk.add_many(f"""
+        INSERT OR REPLACE INTO local_files ({', '.join(LOCAL_FILE_COLUMNS)})
+        VALUES ({', '.join('?' * len(LOCAL_FILE_COLUMNS))})
+    """, (_local_file_row(f) for f in upserts))
+    bulk.add_many("""
+        INSERT INTO articles (source, title, link, published, summary, kind)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (_article_row(f, extracted) for f in upserts))
+
+def refresh_local_files(content_db_path: str, dirs: Dict[str, str] = None,
+                        extract: bool = True, previews: bool = True) -> bool:
+    """Scan local files from all directories and update the database
+
+    Files are identified by a content fingerprint (see get_file_hash), so
+    a renamed or moved file keeps its link and identical copies show up
+    once. The scan is incremental: each file's (path, size, mtime, inode)
+    is compared with the `local_files` table and only new, changed or
+    removed files are written. Folders whose directory is missing (e.g. an
+    unmounted network drive) are left untouched. *dirs* (folder name →
+    directory) defaults to LOCAL_FILES_DIRS. With *extract*, text is then
+    pulled out of new and changed files (see extract.refresh_extracted_text);
+    with *previews*, their previews are rendered (see
+    previews.refresh_previews). Returns whether any row was added, updated
+    or removed.
+    """
+    if dirs is None:
+        dirs = LOCAL_FILES_DIRS
+    started_at = datetime.utcnow()
+    scan_started = time.perf_counter()
     all_files = []
+    scanned_folders = set()
+    stored_paths = _load_fingerprints(content_db_path)
     
-    for folder_name, directory in LOCAL_FILES_DIRS.items():
+    for folder_name, directory in dirs.items():
         print(f"📁 Scanning {folder_name} files in: {directory}")
+        if not os.path.exists(directory):
+            print(f"⚠️  Directory not found: {directory}")
+            continue
         files = scan_local_files(directory, folder_name)
+        scanned_folders.add(folder_name)
         all_files.extend(files)
         print(f"📁 Found {len(files)} files in {folder_name}")
     
-    if not all_files:
+    if not scanned_folders:
         print("📁 No local files found in any directory")
-        return
+        return False
     
-    print(f"📁 Total found: {len(all_files)} local files")
+    # Only fingerprints of files that still exist stay cached
+    seen_keys = {f['stat_key'] for f in all_files}
+    for key in [k for k in _fingerprints if k not in seen_keys]:
+        del _fingerprints[key]
+
+    # Identical copies share a fingerprint and become one item; keep the
+    # path already stored so it doesn't hop between copies
+    unique = {}
+    for f in all_files:
+        kept = unique.get(f['file_hash'])
+        if kept is None or (f['file_path'] == stored_paths.get(f['file_hash'])
+                            and kept['file_path'] != f['file_path']):
+            unique[f['file_hash']] = f
+    duplicates = len(all_files) - len(unique)
+    _duplicates.clear()
+    for f in all_files:
+        if unique[f['file_hash']] is not f:
+            _duplicates.setdefault(f['file_hash'], set()).add(f['file_path'])
+    all_files = list(unique.values())
+
+    print(f"📁 Total found: {len(all_files)} local files"
+          + (f" ({duplicates} duplicate copies collapsed)" if duplicates else ""))
+    scan_seconds = time.perf_counter() - scan_started
+    REFRESH_PHASE_SECONDS.observe(scan_seconds, kind=KIND_LOCAL_FILE, phase="local_scan")
     
-    with sqlite3.connect(content_db_path) as conn:
-        # Create a table for local files if it doesn't exist
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS local_files (
-                id INTEGER PRIMARY KEY,
-                file_hash TEXT UNIQUE,
-                file_path TEXT,
-                title TEXT,
-                file_type TEXT,
-                file_size INTEGER,
-                modified_time DATETIME,
-                folder_name TEXT
+    # The diff is computed and written as one short transaction; the
+    # directory walk above stays outside it
+    with writer(content_db_path) as conn:
+        existing = {
+            row[0]: row for row in conn.execute(
+                f"SELECT {', '.join(LOCAL_FILE_COLUMNS)} FROM local_files"
             )
-        """)
-        
-        # Clear existing local file entries from articles table
-        conn.execute("DELETE FROM articles WHERE source LIKE '%local file)'")
-        
-        # Insert files into both tables
-        for file_info in all_files:
-            # Create source name like "Research Papers(local file)"
-            source_name = f"{file_info['folder_name']}(local file)"
-            
-            # Insert into local_files table for file serving
-            conn.execute("""
-                INSERT OR REPLACE INTO local_files 
-                (file_hash, file_path, title, file_type, file_size, modified_time, folder_name)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                file_info['file_hash'],
-                file_info['file_path'],
-                file_info['title'],
-                file_info['file_type'],
-                file_info['file_size'],
-                file_info['modified_time'],
-                file_info['folder_name']
+        }
+        linked = {
+            link for (link,) in conn.execute(
+                "SELECT link FROM articles WHERE kind = ?", (KIND_LOCAL_FILE,)
+            )
+        }
+        extracted = _load_extracted(conn)
+
+        added, changed = [], []
+        seen = set()
+        for f in all_files:
+            seen.add(f['file_hash'])
+            old = existing.get(f['file_hash'])
+            if old is None:
+                added.append(f)
+            elif old != _local_file_row(f):
+                # Edited, renamed/moved (same content) or a new inode
+                changed.append(f)
+            elif FILE_LINK_PREFIX + f['file_hash'] not in linked:
+                # Metadata unchanged but the feed row went missing
+                added.append(f)
+
+        removed = [
+            file_hash for file_hash, row in existing.items()
+            if file_hash not in seen and row[LOCAL_FILE_COLUMNS.index("folder_name")] in scanned_folders
+        ]
+
+        write_started = time.perf_counter()
+        with BulkWriter(conn) as bulk:
+            _write_changes(bulk, added + changed, removed, extracted)
+
+            unchanged = len(all_files) - len(added) - len(changed)
+            add_history(
+                bulk, started_at=started_at, kind=KIND_LOCAL_FILE, source="local_files",
+                status="ok", scan_seconds=scan_seconds,
+                write_seconds=time.perf_counter() - write_started,
+                new_items=len(added), updated_items=len(changed),
+                unchanged_items=unchanged, removed_items=len(removed),
+            )
+            prune_history(conn)
+        REFRESH_PHASE_SECONDS.observe(time.perf_counter() - write_started,
+                                      kind=KIND_LOCAL_FILE, phase="db_write")
+        for change, count in (("added", len(added)), ("updated", len(changed)),
+                              ("removed", len(removed)), ("unchanged", unchanged)):
+            LOCAL_FILES.inc(count, change=change)
+
+        print(f"✅ Local files: {len(added)} added, {len(changed)} updated, "
+              f"{len(removed)} removed, {unchanged} unchanged")
+
+    changes = bool(added or changed or removed)
+    if extract:
+        from extract import refresh_extracted_text
+        changes = refresh_extracted_text(content_db_path) or changes
+    if previews:
+        from previews import refresh_previews
+        refresh_previews(content_db_path)
+    return changes
+
+def _folder_for(path: str, roots: List[Tuple[str, str]]):
+    for folder_name, root in roots:
+        if path == root or path.startswith(root + os.sep):
+            return folder_name
+    return None
+
+def _surviving_copy(file_hash: str, roots: List[Tuple[str, str]]):
+    """Metadata of a remaining identical copy of *file_hash*, or None"""
+    copies = _duplicates.get(file_hash, set())
+    for path in sorted(copies):
+        copies.discard(path)
+        folder_name = _folder_for(path, roots)
+        if folder_name is None or not os.path.isfile(path):
+            continue
+        try:
+            f = get_file_metadata(Path(path), folder_name)
+        except OSError:
+            continue
+        if f['file_hash'] == file_hash:
+            return f
+    return None
+
+def refresh_local_paths(content_db_path: str, paths, dirs: Dict[str, str] = None,
+                        extract: bool = True, previews: bool = True) -> int:
+    """Update the database for just *paths* (files or directories)
+
+    Used by watch mode (see watch.py) instead of a full rescan: each path
+    below a *dirs* folder is rescanned if it still exists, and stored rows
+    at or below it that no longer match a file there are removed. A file
+    whose fingerprint is already stored for another path that still exists
+    is an identical copy and is skipped, as in refresh_local_files.
+    Returns the number of added, updated and removed files.
+    """
+    if dirs is None:
+        dirs = LOCAL_FILES_DIRS
+    # Innermost folder first, in case LOCAL_FILES_DIRS entries are nested
+    roots = sorted(((name, os.path.abspath(d)) for name, d in dirs.items()),
+                   key=lambda root: len(root[1]), reverse=True)
+    started_at = datetime.utcnow()
+    scan_started = time.perf_counter()
+
+    scopes, files = set(), {}
+    for path in {os.path.abspath(p) for p in paths}:
+        folder_name = _folder_for(path, roots)
+        if folder_name is None:
+            continue
+        scopes.add(path)
+        if os.path.isdir(path):
+            found = scan_local_files(path, folder_name)
+        elif os.path.splitext(path)[1].lower() in SUPPORTED_EXTENSIONS and os.path.isfile(path):
+            try:
+                found = [get_file_metadata(Path(path), folder_name)]
+            except OSError as e:
+                print(f"⚠️  Error processing {path}: {e}")
+                found = []
+        else:
+            found = []
+        for f in found:
+            files[f['file_path']] = f
+    if not scopes:
+        return 0
+    scan_seconds = time.perf_counter() - scan_started
+
+    with writer(content_db_path) as conn:
+        select = f"SELECT {', '.join(LOCAL_FILE_COLUMNS)} FROM local_files"
+
+        in_scope = {}
+        for path in scopes:
+            # The path itself, or anything below it if it was a directory
+            in_scope.update((row[0], row) for row in conn.execute(
+                f"{select} WHERE file_path = ? OR (file_path > ? AND file_path < ?)",
+                (path, path + os.sep, path + chr(ord(os.sep) + 1)),
             ))
-            
-            # Insert into articles table for feed display
-            # Use a special URL format that our backend can handle
-            file_url = f"/api/files/{file_info['file_hash']}"
-            
-            conn.execute("""
-                INSERT INTO articles (source, title, link, published, summary)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                source_name,
-                file_info['title'],
-                file_url,
-                file_info['modified_time'],
-                file_info['summary']
+        hashes = list({f['file_hash'] for f in files.values()})
+        stored = {}
+        for i in range(0, len(hashes), MAX_SQL_PARAMS):
+            chunk = hashes[i:i + MAX_SQL_PARAMS]
+            stored.update((row[0], row) for row in conn.execute(
+                f"{select} WHERE file_hash IN ({', '.join('?' * len(chunk))})", chunk
             ))
-        
-        conn.commit()
-        print(f"✅ Added {len(all_files)} local files to database")
+        path_index = LOCAL_FILE_COLUMNS.index("file_path")
+
+        unique = {}
+        for f in files.values():
+            kept = unique.get(f['file_hash'])
+            old = stored.get(f['file_hash'])
+            if kept is None or (old is not None and f['file_path'] == old[path_index]):
+                unique[f['file_hash']] = f
+
+        added, changed = [], []
+        for file_hash, f in unique.items():
+            old = stored.get(file_hash)
+            if old is None:
+                added.append(f)
+            elif old[path_index] != f['file_path'] and old[path_index] not in files \
+                    and os.path.exists(old[path_index]):
+                # Identical copy of a file that stays at its stored path
+                _duplicates.setdefault(file_hash, set()).add(f['file_path'])
+                continue
+            elif old != _local_file_row(f):
+                changed.append(f)
+            elif conn.execute("SELECT 1 FROM articles WHERE link = ?",
+                              (FILE_LINK_PREFIX + file_hash,)).fetchone() is None:
+                added.append(f)
+        removed = []
+        for file_hash in in_scope:
+            if file_hash in unique:
+                continue
+            # The stored copy is gone; keep the item if another copy is left
+            copy = _surviving_copy(file_hash, roots)
+            if copy is None:
+                removed.append(file_hash)
+            else:
+                unique[file_hash] = copy
+                changed.append(copy)
+
+        if not (added or changed or removed):
+            return 0
+        write_started = time.perf_counter()
+        with BulkWriter(conn) as bulk:
+            _write_changes(bulk, added + changed, removed, _load_extracted(conn))
+            add_history(
+                bulk, started_at=started_at, kind=KIND_LOCAL_FILE, source="local_files.watch",
+                status="ok", scan_seconds=scan_seconds,
+                write_seconds=time.perf_counter() - write_started,
+                new_items=len(added), updated_items=len(changed),
+                unchanged_items=len(unique) - len(added) - len(changed),
+                removed_items=len(removed),
+            )
+        REFRESH_PHASE_SECONDS.observe(time.perf_counter() - write_started,
+                                      kind=KIND_LOCAL_FILE, phase="db_write")
+    for change, count in (("added", len(added)), ("updated", len(changed)),
+                          ("removed", len(removed))):
+        LOCAL_FILES.inc(count, change=change)
+    print(f"✅ Local files (watch): {len(added)} added, {len(changed)} updated, "
+          f"{len(removed)} removed")
+
+    upserted = [f['file_hash'] for f in added + changed]
+    if extract and upserted:
+        from extract import refresh_extracted_text
+        refresh_extracted_text(content_db_path)
+    if previews and upserted:
+        from previews import refresh_previews
+        refresh_previews(content_db_path, hashes=upserted)
+    return len(added) + len(changed) + len(removed)
 
 def get_file_by_hash(content_db_path: str, file_hash: str) -> Tuple[str, str]:
     """Get file path and type by hash"""
-    with sqlite3.connect(content_db_path) as conn:
-        conn.row_factory = sqlite3.Row
-        result = conn.execute(
-            "SELECT file_path, file_type FROM local_files WHERE file_hash = ?",
-            (file_hash,)
-        ).fetchone()
-        
-        if result:
-            return result['file_path'], result['file_type']
+    try:
+        with reader(content_db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            result = conn.execute(
+                "SELECT file_path, file_type FROM local_files WHERE file_hash = ?",
+                (file_hash,)
+            ).fetchone()
+    except (FileNotFoundError, sqlite3.OperationalError):
+        # No content.db / local_files table yet: nothing has been scanned
         return None, None
 
+    if result:
+        return result['file_path'], result['file_type']
+    return None, None
+
 if __name__ == "__main__":
     # Test the scanner
     for folder_name, directory in LOCAL_FILES_DIRS.items():
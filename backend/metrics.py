@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+In-process metrics with Prometheus text exposition (no extra dependency).
+
+• `Counter` / `Histogram` hold labelled series; every metric created here is
+  registered and rendered by `render()` (served at /api/metrics).
+• The metrics below are the ones the refresh pipeline and API record.
+  Values live in the API process; `refresh_history` in content.db keeps
+  the per-refresh numbers across restarts.
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_registry: list = []
+_lock = threading.Lock()
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [
+        '%s="%s"' % (n, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for n, v in zip(names, values)
+    ]
+    if extra:
+        parts.append(extra)
+    return "{%s}" % ",".join(parts) if parts else ""
+
+
+class Counter:
+    """Monotonic counter, one series per label combination."""
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values: dict[tuple, float] = {}
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(labels[n] for n in self.labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with _lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label combination."""
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, list] = {}   # key → [bucket counts…, sum, count]
+        _registry.append(self)
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels[n] for n in self.labels)
+        with _lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            for key, series in sorted(self._series.items()):
+                labels = _format_labels(self.labels, key)
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    le = _format_labels(self.labels, key, 'le="%g"' % bound)
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                le = _format_labels(self.labels, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{le} {series[-1]}")
+                lines.append(f"{self.name}_sum{labels} {series[-2]:g}")
+                lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+def render() -> str:
+    """All registered metrics in Prometheus text format (version 0.0.4)."""
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+# ---------------------------------------------------------------------------
+# Metrics recorded by the refresh pipeline and the API
+# ---------------------------------------------------------------------------
+
+REFRESH_PHASE_SECONDS = Histogram(
+    "feeds_refresh_phase_seconds",
+    "Wall time of one refresh phase (fetch, parse, html_strip, db_write, local_scan, extract, preview).",
+    ("kind", "phase"),
+)
+FEED_FETCH_SECONDS = Histogram(
+    "feeds_fetch_seconds", "Time to download one feed.", ("feed",),
+)
+FEED_FETCHES = Counter(
+    "feeds_fetches_total",
+    "Feed fetches by result (ok, not_modified, unchanged, error).",
+    ("feed", "result"),
+)
+FEED_BYTES = Counter(
+    "feeds_downloaded_bytes_total", "Feed body bytes downloaded.", ("feed",),
+)
+FEED_ENTRIES = Counter(
+    "feeds_entries_total", "Feed entries seen, by status (new, updated, unchanged).",
+    ("feed", "status"),
+)
+LOCAL_FILES = Counter(
+    "feeds_local_files_total",
+    "Local files seen per scan, by change (added, updated, removed, unchanged).",
+    ("change",),
+)
+EXTRACTED_FILES = Counter(
+    "feeds_extracted_files_total",
+    "Local files run through text extraction, by type and status (ok, empty, error).",
+    ("type", "status"),
+)
+SOURCE_RUN_SECONDS = Histogram(
+    "feeds_source_run_seconds", "Duration of one source adapter run.", ("source",),
+)
+SOURCE_RUNS = Counter(
+    "feeds_source_runs_total", "Source adapter runs by outcome.", ("source", "state"),
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "feeds_http_request_seconds",
+    "API latency until the response headers are sent, by route.",
+    ("route", "method", "status"),
+)
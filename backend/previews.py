@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Preview cache for local files (served at /api/files/{hash}/preview).
+
+• `make_preview(path, file_type)` renders one preview: the first page of a
+  PDF as PNG (needs poppler's `pdftoppm` on PATH), an EPUB's cover image,
+  or the opening PREVIEW_TEXT_CHARS of a TXT/MD file.
+• `PreviewCache` stores them on disk as `<file_hash>-<mtime_ns>.<ext>`, so
+  an edited file gets a fresh preview, and evicts the least recently
+  served ones once the directory exceeds PREVIEW_CACHE_MAX_BYTES. Files
+  without a possible preview get an empty `.none` marker so they aren't
+  retried every refresh; types nobody can render here (PDF without
+  pdftoppm) get none, so they are picked up once a renderer exists.
+• `refresh_previews(db_path)` runs after each local files scan and fills
+  the cache for files that don't have a current preview yet.
+  `render_later(db_path, file_hash)` queues the same for one file, for a
+  miss on the API (evicted, or not rendered yet).
+• Run directly: `python backend/previews.py`.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
+
+from db import KIND_LOCAL_FILE, MAX_SQL_PARAMS, reader
+from extract import EPUB_NS, read_opf
+from metrics import REFRESH_PHASE_SECONDS
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+PREVIEW_CACHE_DIR = os.environ.get("PREVIEW_CACHE_DIR", os.path.join(SCRIPT_DIR, "preview_cache"))
+PREVIEW_CACHE_MAX_BYTES = int(os.environ.get("PREVIEW_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+PREVIEW_PX = 480                    # longest side of a rendered PDF page
+PREVIEW_TEXT_CHARS = 2000
+PREVIEW_MAX_BYTES = 2 * 1024 * 1024   # larger EPUB covers are not cached
+PREVIEW_TIMEOUT = 30                # seconds per pdftoppm run
+PREVIEW_WORKERS = 4
+
+PDFTOPPM = shutil.which("pdftoppm")
+
+MEDIA_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "svg": "image/svg+xml",
+    "txt": "text/plain; charset=utf-8",
+    "none": None,
+}
+TMP_SUFFIX = ".tmp"
+IMAGE_EXTENSIONS = {v: k for k, v in MEDIA_TYPES.items() if v and v.startswith("image/")}
+
+# ---------------------------------------------------------------------------
+# Rendering: path → (bytes or None, extension)
+# ---------------------------------------------------------------------------
+
+def _pdf_preview(path: str):
+    with tempfile.TemporaryDirectory(prefix="preview-") as tmp:
+        out = os.path.join(tmp, "page")
+        subprocess.run(
+            [PDFTOPPM, "-png", "-singlefile", "-f", "1", "-l", "1",
+             "-scale-to", str(PREVIEW_PX), path, out],
+            check=True, capture_output=True, timeout=PREVIEW_TIMEOUT,
+        )
+        with open(out + ".png", "rb") as f:
+            return f.read(), "png"
+
+
+def _epub_preview(path: str):
+    with zipfile.ZipFile(path) as book:
+        opf_path, opf = read_opf(book)
+        items = list(opf.iterfind(".//opf:manifest/opf:item", EPUB_NS))
+
+        # EPUB 3 marks the cover item; EPUB 2 points at it from <meta name="cover">
+        cover = next((i for i in items if "cover-image" in (i.get("properties") or "").split()), None)
+        if cover is None:
+            meta = next((m for m in opf.iterfind(".//opf:metadata/opf:meta", EPUB_NS)
+                         if m.get("name") == "cover"), None)
+            if meta is not None:
+                cover = next((i for i in items if i.get("id") == meta.get("content")), None)
+        if cover is None:
+            cover = next((i for i in items
+                          if (i.get("media-type") or "").startswith("image/")
+                          and "cover" in (i.get("id", "") + i.get("href", "")).lower()), None)
+        ext = IMAGE_EXTENSIONS.get(cover.get("media-type")) if cover is not None else None
+        if ext is None:
+            return None, "none"
+
+        name = os.path.normpath(os.path.join(os.path.dirname(opf_path), cover.get("href")))
+        info = book.getinfo(name.replace(os.sep, "/"))
+        if info.file_size > PREVIEW_MAX_BYTES:
+            return None, "none"
+        return book.read(info), ext
+
+
+def _text_preview(path: str):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.read(PREVIEW_TEXT_CHARS).encode("utf-8"), "txt"
+
+
+RENDERERS = {
+    ".epub": _epub_preview,
+    ".txt": _text_preview,
+    ".md": _text_preview,
+}
+if PDFTOPPM is not None:
+    # Without it PDFs get no marker either, so they're rendered once it's installed
+    RENDERERS[".pdf"] = _pdf_preview
+
+
+def can_preview(file_type: str) -> bool:
+    return file_type.lower() in RENDERERS
+
+
+def make_preview(path: str, file_type: str):
+    """(preview bytes, extension), or (None, "none") when the file has none.
+
+    None when its type can't be rendered here: nothing worth caching.
+    """
+    renderer = RENDERERS.get(file_type.lower())
+    if renderer is None:
+        return None
+    try:
+        return renderer(path)
+    except Exception as exc:
+        logging.warning("⚠️  No preview for %s: %s: %s", path, type(exc).__name__, exc)
+        return None, "none"
+
+# ---------------------------------------------------------------------------
+# On-disk LRU store
+# ---------------------------------------------------------------------------
+
+class Preview(NamedTuple):
+    path: str
+    media_type: Optional[str]       # None: the file has no preview
+
+
+class PreviewCache:
+    """Size-bounded directory of previews keyed by (file_hash, mtime_ns).
+
+    Recency is the preview file's mtime, bumped on every hit, so the LRU
+    order survives restarts and is shared by every process using the
+    directory.
+    """
+
+    def __init__(self, directory: str = PREVIEW_CACHE_DIR,
+                 max_bytes: int = PREVIEW_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None           # bytes on disk, counted on first put
+        self._lock = threading.Lock()
+
+    def _path(self, file_hash: str, mtime_ns: int, ext: str) -> str:
+        return os.path.join(self.directory, f"{file_hash}-{mtime_ns:x}.{ext}")
+
+    def get(self, file_hash: str, mtime_ns: int, touch: bool = True) -> Optional[Preview]:
+        """The cached preview, or None on a miss; *touch* marks it as used."""
+        for ext, media_type in MEDIA_TYPES.items():
+            path = self._path(file_hash, mtime_ns, ext)
+            try:
+                if touch:
+                    os.utime(path)
+                elif not os.path.exists(path):
+                    continue
+            except OSError:
+                continue
+            return Preview(path, media_type)
+        return None
+
+    def put(self, file_hash: str, mtime_ns: int, data: Optional[bytes], ext: str) -> Preview:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(file_hash, mtime_ns, ext)
+        # Write-then-rename so readers never see half a preview
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=TMP_SUFFIX)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data or b"")
+        try:
+            replaced = os.path.getsize(path)     # re-rendered by another thread
+        except OSError:
+            replaced = 0
+        os.replace(tmp, path)
+        with self._lock:
+            if self._size is None:
+                self._size = self._disk_usage()
+            else:
+                self._size += len(data or b"") - replaced
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+        return Preview(path, MEDIA_TYPES[ext])
+
+    def _entries(self) -> list:
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(TMP_SUFFIX):
+                    continue    # another put() in flight: not ours to evict
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def _disk_usage(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> int:
+        """Delete least recently used previews until under max_bytes; returns the count."""
+        with self._lock:
+            entries = sorted(self._entries())
+            size = sum(s for _, s, _ in entries)
+            # Go down to 90% so the next few puts don't each trigger a scan
+            target, removed = self.max_bytes * 0.9, 0
+            for _, entry_size, path in entries:
+                if size <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                size -= entry_size
+                removed += 1
+            self._size = size
+            return removed
+
+# ---------------------------------------------------------------------------
+# Background refresh
+# ---------------------------------------------------------------------------
+
+_cache: Optional[PreviewCache] = None
+
+
+def get_cache() -> PreviewCache:
+    """The process-wide cache on PREVIEW_CACHE_DIR."""
+    global _cache
+    if _cache is None:
+        _cache = PreviewCache()
+    return _cache
+
+
+def refresh_previews(db_path: str, cache: Optional[PreviewCache] = None,
+                     hashes: Optional[list] = None) -> None:
+    """Render previews for local files that have no current one cached.
+
+    *hashes* limits the check (and the query) to those files (watch mode,
+    API misses), instead of stat-ing every file in local_files.
+    """
+    cache = cache or get_cache()
+    if not os.path.exists(db_path):
+        return
+    select = ("SELECT file_hash, file_path, file_type FROM local_files "
+              f"WHERE lower(file_type) IN ({', '.join('?' * len(RENDERERS))})")
+    with reader(db_path) as conn:
+        try:
+            if hashes is None:
+                files = conn.execute(select, tuple(RENDERERS)).fetchall()
+            else:
+                hashes, files = list(hashes), []
+                for i in range(0, len(hashes), MAX_SQL_PARAMS):
+                    chunk = hashes[i:i + MAX_SQL_PARAMS]
+                    files += conn.execute(
+                        f"{select} AND file_hash IN ({', '.join('?' * len(chunk))})",
+                        (*RENDERERS, *chunk),
+                    ).fetchall()
+        except sqlite3.OperationalError as exc:
+            # No local_files table yet: nothing scanned
+            logging.info("🖼️  No previews to build (%s)", exc)
+            return
+
+    def build(row) -> bool:
+        file_hash, path, file_type = row
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return False
+        if cache.get(file_hash, mtime_ns, touch=False) is not None:
+            return False
+        preview = make_preview(path, file_type)
+        if preview is None:
+            return False
+        cache.put(file_hash, mtime_ns, *preview)
+        return True
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=PREVIEW_WORKERS, thread_name_prefix="previews") as pool:
+        built = sum(pool.map(build, files))
+    if built:
+        elapsed = time.perf_counter() - started
+        REFRESH_PHASE_SECONDS.observe(elapsed, kind=KIND_LOCAL_FILE, phase="preview")
+        print(f"🖼️  Built {built} previews in {elapsed:.1f}s")
+    if PDFTOPPM is None:
+        logging.info("🖼️  pdftoppm not found: PDFs have no preview (install poppler-utils)")
+
+
+_pending: set = set()
+_pending_lock = threading.Lock()
+_background: Optional[ThreadPoolExecutor] = None
+
+
+def render_later(db_path: str, file_hash: str) -> None:
+    """Queue refresh_previews for one file on a background thread.
+
+    Repeated requests for a file that is already queued are dropped.
+    """
+    global _background
+    with _pending_lock:
+        if file_hash in _pending:
+            return
+        _pending.add(file_hash)
+        if _background is None:
+            _background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="previews-miss")
+
+    def run() -> None:
+        try:
+            refresh_previews(db_path, hashes=[file_hash])
+        except Exception:
+            logging.exception("🖼️  Preview for %s failed", file_hash)
+        finally:
+            with _pending_lock:
+                _pending.discard(file_hash)
+
+    _background.submit(run)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    refresh_previews(os.path.join(SCRIPT_DIR, "content.db"))
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Snapshot export: latest() precomputed as one immutable, compressed file.
+
+• `export_snapshot(db_path)` runs after each refresh and writes the newest
+  SNAPSHOT_PER_SOURCE items of every source, stored column by column (one
+  array per field, which gzip/brotli compress far better than row objects)
+  plus a source index of (name, first row, row count, newest published).
+• Files are content-addressed and versioned, `latest-<sha256[:16]>.v1.json`
+  (+ `.gz`, and `.br` when brotli is installed), named after the
+  uncompressed body: an unchanged export writes nothing and a published
+  name never changes, so it can be cached forever. `manifest.json` points
+  at the current one; the SNAPSHOT_KEEP newest stay for clients that still
+  hold an older manifest.
+• `open_snapshot(directory)` memory-maps the current file. latest() answers
+  from it instead of running the window query (see api/latest.py), and
+  /api/snapshot serves the compressed bytes as they are. The directory can
+  just as well be deployed as static assets.
+• Run directly: `python backend/snapshot.py [--out DIR]`.
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+from db import PER_SOURCE_SQL, reader
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", os.path.join(SCRIPT_DIR, "snapshots"))
+SNAPSHOT_PER_SOURCE = int(os.environ.get("SNAPSHOT_PER_SOURCE", 50))
+SNAPSHOT_KEEP = 3
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+ENCODINGS = {"gzip": ".gz", "br": ".br"}
+NAME_RE = re.compile(r"latest-[0-9a-f]{16}\.v\d+\.json")
+
+_export_lock = threading.Lock()
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def _build(db_path: str, per_source: int) -> Optional[dict]:
+    with reader(db_path) as conn:
+        try:
+            cursor = conn.execute(
+                f"SELECT * FROM ({PER_SOURCE_SQL.format(extra='')}) "
+                "ORDER BY source, published DESC, id DESC",
+                (per_source,),
+            )
+        except sqlite3.OperationalError as exc:
+            # No articles table yet: nothing refreshed
+            logging.info("📦 No snapshot to export (%s)", exc)
+            return None
+        names = [d[0] for d in cursor.description]
+        rows = cursor.fetchall()
+
+    source_at, published_at = names.index("source"), names.index("published")
+    columns = [n for n in names if n != "source"]
+    data = {n: [] for n in columns}
+    sources = []
+    for row in rows:
+        if not sources or sources[-1]["name"] != row[source_at]:
+            sources.append({"name": row[source_at], "start": len(data["id"]), "count": 0,
+                            "newest": row[published_at]})
+        sources[-1]["count"] += 1
+        for i, name in enumerate(names):
+            if i != source_at:
+                data[name].append(row[i])
+    return {
+        "format": "latest-columnar",
+        "version": FORMAT_VERSION,
+        "per_source": per_source,
+        "columns": columns,
+        "sources": sources,
+        "data": data,
+    }
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.chmod(tmp, 0o644)     # world-readable, for static hosting
+    os.replace(tmp, path)
+
+
+def _prune(directory: str, keep: set) -> None:
+    """Delete all but the SNAPSHOT_KEEP newest snapshots (and *keep*)."""
+    groups = {}
+    for entry in os.scandir(directory):
+        name = entry.name.rsplit(".json", 1)[0] + ".json"
+        if NAME_RE.fullmatch(name):
+            groups.setdefault(name, []).append(entry)
+    by_age = sorted(groups, key=lambda n: max(e.stat().st_mtime for e in groups[n]), reverse=True)
+    for name in by_age[SNAPSHOT_KEEP:]:
+        if name not in keep:
+            for entry in groups[name]:
+                os.remove(entry.path)
+
+
+def export_snapshot(db_path: str, directory: str = SNAPSHOT_DIR,
+                    per_source: int = SNAPSHOT_PER_SOURCE) -> Optional[dict]:
+    """Write the current snapshot of *db_path*; returns its manifest.
+
+    Nothing but the manifest is rewritten when the content is unchanged.
+    """
+    if not os.path.exists(db_path):
+        return None
+    snapshot = _build(db_path, per_source)
+    if snapshot is None:
+        return None
+    # Sorted keys + gzip mtime=0: the same content always gives the same bytes
+    body = json.dumps(snapshot, ensure_ascii=False, sort_keys=True, separators=(",", ":"),
+                      default=str).encode("utf-8")
+    digest = hashlib.sha256(body).hexdigest()
+    name = f"latest-{digest[:16]}.v{FORMAT_VERSION}.json"
+
+    with _export_lock:
+        os.makedirs(directory, exist_ok=True)
+        encodings = {}
+        for encoding, suffix in ENCODINGS.items():
+            if encoding == "br" and brotli is None:
+                continue
+            path = os.path.join(directory, name + suffix)
+            encodings[encoding] = name + suffix
+            if not os.path.exists(path):
+                _write_atomic(path, gzip.compress(body, 9, mtime=0) if encoding == "gzip"
+                              else brotli.compress(body, quality=11))
+        manifest = {
+            "version": FORMAT_VERSION,
+            "name": name,
+            "sha256": digest,
+            "bytes": len(body),
+            "encodings": encodings,
+            "per_source": per_source,
+            "sources": len(snapshot["sources"]),
+            "items": len(snapshot["data"]["id"]),
+            "exported_at": datetime.utcnow().isoformat(),
+        }
+        _write_atomic(os.path.join(directory, MANIFEST),
+                      json.dumps(manifest, indent=2).encode("utf-8") + b"\n")
+        _prune(directory, keep={name})
+    print(f"📦 Snapshot {name}: {manifest['items']} items from {manifest['sources']} sources "
+          f"({os.path.getsize(os.path.join(directory, encodings['gzip'])) / 1024:,.0f} KB gzipped)")
+    return manifest
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+class Snapshot:
+    """One snapshot file, memory-mapped per encoding.
+
+    `raw(encoding)` is the compressed body as stored; `rows(per_source)`
+    decodes the gzip copy once and returns latest()-shaped row dicts.
+    """
+
+    def __init__(self, directory: str, name: str, sha256: Optional[str] = None):
+        self.name = name
+        self.sha256 = sha256
+        self.etag = f'"s{name.split("-")[1].split(".")[0]}"'
+        self._maps = {}
+        for encoding, suffix in ENCODINGS.items():
+            try:
+                with open(os.path.join(directory, name + suffix), "rb") as f:
+                    self._maps[encoding] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                continue    # not written (no brotli), or pruned meanwhile
+        if "gzip" not in self._maps:
+            raise FileNotFoundError(os.path.join(directory, name + ENCODINGS["gzip"]))
+        self._rows = None
+        self._lock = threading.Lock()
+
+    @property
+    def encodings(self) -> list:
+        return list(self._maps)
+
+    def raw(self, encoding: str) -> bytes:
+        return self._maps[encoding][:]
+
+    def _decode(self) -> tuple:
+        body = gzip.decompress(self._maps["gzip"])
+        if self.sha256 and hashlib.sha256(body).hexdigest() != self.sha256:
+            raise ValueError(f"snapshot {self.name} does not match its manifest")
+        snapshot = json.loads(body)
+        keys = ["source", *snapshot["columns"]]
+        sources = [name for s in snapshot["sources"] for name in [s["name"]] * s["count"]]
+        rows = [dict(zip(keys, values)) for values in
+                zip(sources, *(snapshot["data"][c] for c in snapshot["columns"]))]
+        per_source = [rows[s["start"]:s["start"] + s["count"]] for s in snapshot["sources"]]
+        return snapshot["per_source"], per_source
+
+    @property
+    def per_source(self) -> int:
+        return self._load()[0]
+
+    def _load(self) -> tuple:
+        with self._lock:
+            if self._rows is None:
+                self._rows = self._decode()
+            return self._rows
+
+    def rows(self, per_source: int) -> list:
+        """Newest *per_source* rows of each source (at most the exported N)."""
+        return [row for rows in self._load()[1] for row in rows[:per_source]]
+
+
+def read_manifest(directory: str = SNAPSHOT_DIR) -> Optional[dict]:
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == FORMAT_VERSION else None
+
+
+def open_snapshot(directory: str = SNAPSHOT_DIR, name: Optional[str] = None) -> Optional[Snapshot]:
+    """The current snapshot (or the kept one called *name*), or None."""
+    sha256 = None
+    if name is None:
+        manifest = read_manifest(directory)
+        if manifest is None:
+            return None
+        name, sha256 = manifest["name"], manifest["sha256"]
+    elif not NAME_RE.fullmatch(name):
+        return None
+    try:
+        return Snapshot(directory, name, sha256)
+    except FileNotFoundError:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the latest() snapshot of content.db.")
+    parser.add_argument("--db", default=os.path.join(SCRIPT_DIR, "content.db"))
+    parser.add_argument("--out", default=SNAPSHOT_DIR,
+                        help="directory, e.g. frontend/public/snapshots for static serving")
+    parser.add_argument("--per-source", type=int, default=SNAPSHOT_PER_SOURCE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    export_snapshot(args.db, args.out, args.per_source)
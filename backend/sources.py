@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Source adapters – one interface for everything that writes into content.db.
+
+• `SourceAdapter` has a name, a refresh interval, a timeout and
+  `refresh(db_path)`; sources that can follow changes as they happen also
+  implement `start_watch(db_path)`; `register_adapter("type")` adds a class to
+  ADAPTER_TYPES so config files can refer to it.
+• `load_sources()` builds the adapters from sources.json (or $SOURCES_CONFIG,
+  see sources.example.json). Without a config file the built-in FEEDS and
+  LOCAL_FILES_DIRS are used.
+• `run_source(adapter, db_path)` runs one adapter in its own thread with its
+  timeout and catches its errors; `refresh_all(db_path)` runs every enabled
+  source in parallel.
+• Run directly: `python backend/sources.py` refreshes backend/content.db.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple, Optional
+
+from metrics import SOURCE_RUN_SECONDS, SOURCE_RUNS
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+SOURCES_CONFIG = os.environ.get("SOURCES_CONFIG", os.path.join(SCRIPT_DIR, "sources.json"))
+
+DEFAULT_INTERVAL_MINUTES = 30
+DEFAULT_TIMEOUT_SECONDS = 600
+WATCH_RESCAN_MINUTES = 360      # full local files scan while inotify watches
+
+# ---------------------------------------------------------------------------
+# Adapter interface + registry
+# ---------------------------------------------------------------------------
+
+ADAPTER_TYPES: dict[str, type] = {}
+
+
+def register_adapter(type_name: str):
+    """Class decorator: make an adapter available as `"type": type_name`."""
+    def decorator(cls):
+        ADAPTER_TYPES[type_name] = cls
+        cls.type_name = type_name
+        return cls
+    return decorator
+
+
+class SourceAdapter:
+    """Base class; subclasses implement `refresh(db_path)`.
+
+    *interval_minutes* is how often the scheduler runs the source and
+    *timeout_seconds* how long a run may take before it is reported as
+    timed out. Each adapter runs at most once at a time.
+    """
+
+    type_name = "base"
+
+    def __init__(self, name: str, interval_minutes: float = DEFAULT_INTERVAL_MINUTES,
+                 timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS, enabled: bool = True):
+        self.name = name
+        self.interval_minutes = interval_minutes
+        self.timeout_seconds = timeout_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def refresh(self, db_path: str) -> Optional[bool]:
+        """Bring the source's rows in *db_path* up to date.
+
+        Returns False when nothing was written (None: unknown).
+        """
+        raise NotImplementedError
+
+    def start_watch(self, db_path: str, on_change: Optional[Callable[[], None]] = None) -> bool:
+        """Start pushing changes into *db_path* as they happen; False if unsupported."""
+        return False
+
+    @property
+    def schedule_minutes(self) -> float:
+        """How often the scheduler should run `refresh` (longer while watching)."""
+        return self.interval_minutes
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {self.name!r} every {self.interval_minutes}m>"
+
+
+@register_adapter("rss")
+class RSSAdapter(SourceAdapter):
+    """RSS/Atom/YouTube feeds via feeds.refresh_feeds; *feeds* defaults to FEEDS.
+
+    Each run only fetches the feeds whose own adaptive schedule is due, so
+    the adapter interval is just how often that is checked.
+    """
+
+    def __init__(self, name: str, feeds: Optional[dict[str, str]] = None,
+                 keep_latest: int = 1000, **options):
+        super().__init__(name, **options)
+        self.feeds = feeds
+        self.keep_latest = keep_latest
+
+    def refresh(self, db_path: str) -> bool:
+        from feeds import refresh_feeds
+        return refresh_feeds(db_path, keep_latest=self.keep_latest, feeds=self.feeds)
+
+
+@register_adapter("local_files")
+class LocalFilesAdapter(SourceAdapter):
+    """Documents on disk via local_files.refresh_local_files; *dirs* defaults to LOCAL_FILES_DIRS.
+
+    With *watch* the server also follows filesystem events (see watch.py).
+    Once inotify covers every folder (all exist and are on local
+    filesystems) the full rescan only runs every *rescan_minutes* as a
+    safety net; otherwise it keeps *interval_minutes*.
+    """
+
+    def __init__(self, name: str, dirs: Optional[dict[str, str]] = None, watch: bool = True,
+                 rescan_minutes: float = WATCH_RESCAN_MINUTES, **options):
+        super().__init__(name, **options)
+        self.dirs = dirs
+        self.watch = watch
+        self.rescan_minutes = rescan_minutes
+        self._watch = None
+
+    def refresh(self, db_path: str) -> bool:
+        from local_files import refresh_local_files
+        return refresh_local_files(db_path, dirs=self.dirs)
+
+    def start_watch(self, db_path: str, on_change: Optional[Callable[[], None]] = None) -> bool:
+        if not self.watch or self._watch is not None:
+            return False
+        from watch import watch_local_files
+        # Holding the adapter lock keeps watch updates and full scans apart
+        self._watch = watch_local_files(db_path, self.dirs, lock=self._lock, on_change=on_change)
+        return True
+
+    @property
+    def schedule_minutes(self) -> float:
+        if self._watch is not None and self._watch.complete:
+            return max(self.interval_minutes, self.rescan_minutes)
+        return self.interval_minutes
+
+
+@register_adapter("onebird")
+class OnebirdAdapter(SourceAdapter):
+    """Latest posts of a onebird.sqlite dump via local_feeds.refresh_local_sources."""
+
+    def __init__(self, name: str, path: str, **options):
+        super().__init__(name, **options)
+        self.path = path
+
+    def refresh(self, db_path: str) -> bool:
+        from local_feeds import refresh_local_sources
+        return refresh_local_sources(db_path, {"onebird": self.path})
+
+# ---------------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------------
+
+def default_sources() -> list[SourceAdapter]:
+    """What runs without a config file: FEEDS and LOCAL_FILES_DIRS."""
+    # The RSS source only ticks: each feed keeps its own adaptive schedule
+    return [RSSAdapter("feeds", interval_minutes=5, timeout_seconds=300),
+            LocalFilesAdapter("local_files")]
+
+
+def load_sources(path: str = SOURCES_CONFIG) -> list[SourceAdapter]:
+    """Build adapters from the JSON config at *path* (falls back to defaults).
+
+    Each entry needs a unique "name" and a registered "type"; every other
+    key is passed to the adapter's constructor.
+    """
+    if not os.path.exists(path):
+        return default_sources()
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+
+    adapters = []
+    for entry in config.get("sources", []):
+        options = dict(entry)
+        name = options.pop("name", None)
+        type_name = options.pop("type", None)
+        if not name:
+            raise ValueError(f"{path}: every source needs a name")
+        if type_name not in ADAPTER_TYPES:
+            raise ValueError(f"{path}: source {name!r} has unknown type {type_name!r} "
+                             f"(known: {', '.join(sorted(ADAPTER_TYPES))})")
+        if any(a.name == name for a in adapters):
+            raise ValueError(f"{path}: duplicate source name {name!r}")
+        adapters.append(ADAPTER_TYPES[type_name](name, **options))
+    return adapters
+
+# ---------------------------------------------------------------------------
+# Running
+# ---------------------------------------------------------------------------
+
+class SourceRun(NamedTuple):
+    source: str
+    state: str                  # ok | failed | timeout | skipped
+    duration: float
+    error: Optional[str] = None
+
+
+def run_source(adapter: SourceAdapter, db_path: str,
+               on_finish: Optional[Callable[[SourceAdapter, Optional[bool]], None]] = None,
+               on_start: Optional[Callable[[SourceAdapter], None]] = None) -> SourceRun:
+    """Run *adapter* once, isolating its errors and enforcing its timeout.
+
+    Returns "skipped" when the adapter is still busy with an earlier run;
+    otherwise *on_start* is called once the run holds the adapter's lock.
+    Python threads cannot be killed, so after a timeout the run keeps going
+    in the background (holding the adapter's lock, so it is never run twice
+    at once); *on_finish* is called whenever it actually ends, with what
+    `refresh` returned (False: nothing changed; None after an error).
+    """
+    if not adapter._lock.acquire(blocking=False):
+        return SourceRun(adapter.name, "skipped", 0.0)
+    if on_start:
+        on_start(adapter)
+
+    error = []
+
+    def target():
+        changed = None
+        try:
+            changed = adapter.refresh(db_path)
+        except Exception as exc:
+            logging.exception("Source %s failed", adapter.name)
+            error.append(f"{type(exc).__name__}: {exc}")
+        finally:
+            adapter._lock.release()
+            if on_finish:
+                on_finish(adapter, changed)
+
+    started = time.perf_counter()
+    worker = threading.Thread(target=target, name=f"source-{adapter.name}", daemon=True)
+    worker.start()
+    worker.join(adapter.timeout_seconds)
+    duration = time.perf_counter() - started
+    if worker.is_alive():
+        logging.error("Source %s still running after %ss", adapter.name, adapter.timeout_seconds)
+        run = SourceRun(adapter.name, "timeout", duration,
+                        f"still running after {adapter.timeout_seconds}s")
+    elif error:
+        run = SourceRun(adapter.name, "failed", duration, error[0])
+    else:
+        run = SourceRun(adapter.name, "ok", duration)
+    SOURCE_RUNS.inc(source=adapter.name, state=run.state)
+    SOURCE_RUN_SECONDS.observe(duration, source=adapter.name)
+    return run
+
+
+def refresh_all(db_path: str, adapters: Optional[list[SourceAdapter]] = None) -> list[SourceRun]:
+    """Run every enabled source in parallel; one failing doesn't stop the rest."""
+    if adapters is None:
+        adapters = load_sources()
+    adapters = [a for a in adapters if a.enabled]
+    if not adapters:
+        return []
+    with ThreadPoolExecutor(max_workers=len(adapters), thread_name_prefix="sources") as pool:
+        return list(pool.map(lambda a: run_source(a, db_path), adapters))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    DB_PATH = os.path.join(SCRIPT_DIR, "content.db")
+    runs = refresh_all(DB_PATH)
+    from db import checkpoint
+    from snapshot import export_snapshot
+    export_snapshot(DB_PATH)
+    checkpoint(DB_PATH)
+    for run in runs:
+        icon = "✅" if run.state == "ok" else "❌"
+        print(f"{icon} {run.source}: {run.state} in {run.duration:.1f}s"
+              + (f" – {run.error}" if run.error else ""))
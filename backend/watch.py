@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Watch mode for LOCAL_FILES_DIRS: filesystem events instead of rescans.
+
+• `InotifyWatcher` (Linux, through libc via ctypes – no extra dependency)
+  watches every directory below the roots and reports created, written,
+  moved and deleted paths. An idle library costs no I/O at all.
+• `PollingWatcher` is the fallback elsewhere (or when inotify is out of
+  watches): it diffs (size, mtime) of the tree every POLL_SECONDS.
+• Both only mark paths dirty in a `DebouncedQueue`; once events stop for
+  DEBOUNCE_SECONDS (or MAX_DELAY_SECONDS after the first one, for a long
+  copy) the batch goes to local_files.refresh_local_paths, which updates
+  just those rows.
+• `watch_local_files(db_path, dirs)` starts it all; run directly:
+  `python backend/watch.py` watches backend/content.db until Ctrl-C.
+"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from local_files import LOCAL_FILES_DIRS, SUPPORTED_EXTENSIONS, _iter_supported_files, refresh_local_paths
+
+DEBOUNCE_SECONDS = float(os.environ.get("WATCH_DEBOUNCE_SECONDS", 2))
+MAX_DELAY_SECONDS = 30
+MAX_RETRIES = 3                     # per failed batch, with doubling delays
+POLL_SECONDS = float(os.environ.get("WATCH_POLL_SECONDS", 60))
+
+# ---------------------------------------------------------------------------
+# Debounced queue of dirty paths
+# ---------------------------------------------------------------------------
+
+class DebouncedQueue:
+    """Collect paths and hand them to *apply* in batches.
+
+    A batch is flushed once no new path arrived for *delay* seconds, or
+    *max_delay* seconds after its first path, whichever comes first.
+    A failing batch is retried MAX_RETRIES times with doubling delays, then
+    path by path, so one bad path (an unreadable file, a name that can't be
+    stored) is logged and dropped instead of holding up the rest.
+    """
+
+    def __init__(self, apply: Callable[[set], None], delay: float = DEBOUNCE_SECONDS,
+                 max_delay: float = MAX_DELAY_SECONDS):
+        self.apply = apply
+        self.delay = delay
+        self.max_delay = max_delay
+        self._paths: set = set()
+        self._first = self._last = 0.0
+        self._cond = threading.Condition()
+        self._stopped = False
+
+    def add(self, paths: Iterable[str]) -> None:
+        with self._cond:
+            now = time.monotonic()
+            if not self._paths:
+                self._first = now
+            self._paths.update(paths)
+            self._last = now
+            self._cond.notify()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if self._paths:
+                        now = time.monotonic()
+                        due = min(self._last + self.delay, self._first + self.max_delay)
+                        if now >= due:
+                            break
+                        self._cond.wait(due - now)
+                    else:
+                        self._cond.wait()
+                if self._stopped:
+                    return
+                batch, self._paths = self._paths, set()
+            self._apply(batch)
+
+    def _wait(self, seconds: float) -> bool:
+        """Sleep up to *seconds*; True if stopped meanwhile."""
+        end = time.monotonic() + seconds
+        with self._cond:
+            while not self._stopped and time.monotonic() < end:
+                self._cond.wait(end - time.monotonic())
+            return self._stopped
+
+    def _apply(self, batch: set) -> None:
+        delay = self.delay
+        for attempt in range(1, MAX_RETRIES + 1):
+            try:
+                self.apply(batch)
+                return
+            except Exception as exc:
+                logging.warning("👀 Watch update failed for %d paths (attempt %d/%d): %s: %s",
+                                len(batch), attempt, MAX_RETRIES, type(exc).__name__, exc)
+            if self._wait(delay):
+                return
+            delay *= 2
+        for path in sorted(batch):
+            try:
+                self.apply({path})
+            except Exception:
+                logging.exception("👀 Watch update failed for %s; dropped until it changes again", path)
+
+# ---------------------------------------------------------------------------
+# Watchers: roots → dirty paths
+# ---------------------------------------------------------------------------
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+EVENT = struct.Struct("iIII")       # wd, mask, cookie, len; then len bytes of name
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch, libc.inotify_rm_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+_libc = _load_libc()
+
+
+# Changes made on other machines never reach inotify on these
+NETWORK_FILESYSTEMS = {
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "afs", "9p", "ceph", "glusterfs",
+    "lustre", "gpfs", "davfs", "fuse.sshfs", "fuse.rclone", "fuse.s3fs",
+}
+
+
+def _filesystem_type(path: str) -> Optional[str]:
+    """Type of the filesystem *path* is on, from /proc/mounts (None if unknown)."""
+    path = os.path.realpath(path)
+    best, fstype = "", None
+    try:
+        with open("/proc/mounts", encoding="utf-8") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount = fields[1].replace("\\040", " ")
+                if (path == mount or path.startswith(mount.rstrip("/") + "/")) and len(mount) > len(best):
+                    best, fstype = mount, fields[2]
+    except OSError:
+        return None
+    return fstype
+
+
+def _uncovered_roots(roots: Iterable[str]) -> list:
+    """Roots inotify can't fully follow: missing, or on a network filesystem."""
+    return [root for root in roots
+            if not os.path.isdir(root) or _filesystem_type(root) in NETWORK_FILESYSTEMS]
+
+
+def _relevant(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in SUPPORTED_EXTENSIONS
+
+
+class InotifyWatcher:
+    """Recursive inotify watch on *roots*; calls *on_paths* with dirty paths."""
+
+    native = True
+
+    def __init__(self, roots: Iterable[str], on_paths: Callable[[set], None]):
+        if _libc is None:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self.roots = [os.path.abspath(r) for r in roots]
+        self.on_paths = on_paths
+        self._fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: dict[int, str] = {}     # watch descriptor → directory
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        try:
+            for root in self.roots:
+                if os.path.isdir(root):
+                    self._add_tree(root)
+        except OSError:
+            os.close(self._fd)
+            raise
+
+    def _add_tree(self, top: str) -> None:
+        # ENOSPC (fs.inotify.max_user_watches) propagates so callers can fall back
+        for directory, subdirs, _ in os.walk(top):
+            wd = _libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                    subdirs.clear()
+                    continue
+                raise OSError(err, f"inotify_add_watch failed for {directory}")
+            self._dirs[wd] = directory
+
+    def start(self) -> "InotifyWatcher":
+        self._thread = threading.Thread(target=self._run, name="watch-inotify", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        os.close(self._fd)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            # The timeout only serves stop(); the thread sleeps in select otherwise
+            ready, _, _ = select.select([self._fd], [], [], 1.0)
+            if not ready:
+                continue
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            dirty = set()
+            try:
+                self._handle(data, dirty)
+            except OSError as e:
+                logging.warning("⚠️  Watch: %s", e)
+            if dirty:
+                self.on_paths(dirty)
+
+    def _handle(self, data: bytes, dirty: set) -> None:
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, offset)
+            name = data[offset + EVENT.size:offset + EVENT.size + length].rstrip(b"\0")
+            offset += EVENT.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost: treat every root as changed
+                logging.warning("⚠️  Watch: inotify queue overflowed, rescanning")
+                dirty.update(self.roots)
+                continue
+            directory = self._dirs.get(wd)
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            if directory is None:
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                # Below a root the parent's event covers it (a moved
+                # directory keeps its watch; IN_MOVED_TO re-maps its path)
+                if directory in self.roots:
+                    logging.warning("⚠️  Watch: %s was moved or deleted", directory)
+                    dirty.add(directory)
+                continue
+
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path)
+                if mask & (IN_CREATE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE):
+                    dirty.add(path)
+            elif _relevant(path):
+                dirty.add(path)
+
+
+class PollingWatcher:
+    """Diff (size, mtime) of every supported file below *roots* every *interval* seconds."""
+
+    native = False
+
+    def __init__(self, roots: Iterable[str], on_paths: Callable[[set], None],
+                 interval: float = POLL_SECONDS):
+        self.roots = [os.path.abspath(r) for r in roots]
+        self.on_paths = on_paths
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._state = self._snapshot()
+
+    def _snapshot(self) -> dict:
+        state = {}
+        for root in self.roots:
+            if os.path.isdir(root):
+                for path, stat in _iter_supported_files(root):
+                    state[path] = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        return state
+
+    def start(self) -> "PollingWatcher":
+        self._thread = threading.Thread(target=self._run, name="watch-poll", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            state = self._snapshot()
+            old, self._state = self._state, state
+            dirty = {p for p in state.keys() | old.keys() if state.get(p) != old.get(p)}
+            if dirty:
+                self.on_paths(dirty)
+
+
+def make_watcher(roots: Iterable[str], on_paths: Callable[[set], None]):
+    """An inotify watcher where possible, else a polling one."""
+    roots = list(roots)
+    try:
+        return InotifyWatcher(roots, on_paths)
+    except OSError as e:
+        logging.info("👀 inotify unavailable (%s), polling every %ss", e, POLL_SECONDS)
+        return PollingWatcher(roots, on_paths)
+
+# ---------------------------------------------------------------------------
+# Wiring
+# ---------------------------------------------------------------------------
+
+class LocalFilesWatch:
+    """A running watcher + debounced queue; `stop()` shuts both down."""
+
+    def __init__(self, watcher, queue: DebouncedQueue):
+        self.watcher = watcher
+        self.queue = queue
+        self.native = watcher.native
+        # Folders that don't exist yet aren't watched, and network drives
+        # change behind inotify's back: those still need periodic rescans
+        self.uncovered = _uncovered_roots(watcher.roots)
+        self.complete = self.native and not self.uncovered
+        self._thread = threading.Thread(target=queue.run, name="watch-apply", daemon=True)
+
+    def start(self) -> "LocalFilesWatch":
+        self._thread.start()
+        self.watcher.start()
+        return self
+
+    def stop(self) -> None:
+        self.watcher.stop()
+        self.queue.stop()
+        self._thread.join()
+
+
+def watch_local_files(db_path: str, dirs: Optional[dict] = None,
+                      lock: Optional[threading.Lock] = None,
+                      on_change: Optional[Callable[[], None]] = None) -> LocalFilesWatch:
+    """Keep local_files/articles in *db_path* in step with the *dirs* trees.
+
+    *lock* is held while a batch is applied so it never overlaps a full
+    scan of the same files (pass the source adapter's lock); *on_change*
+    is called after a batch that changed anything.
+    """
+    if dirs is None:
+        dirs = LOCAL_FILES_DIRS
+
+    def apply(paths: set) -> None:
+        with lock or threading.Lock():
+            changes = refresh_local_paths(db_path, paths, dirs=dirs)
+        if changes and on_change:
+            on_change()
+
+    queue = DebouncedQueue(apply)
+    watcher = make_watcher(dirs.values(), queue.add)
+    mode = "inotify" if watcher.native else f"polling every {POLL_SECONDS:g}s"
+    print(f"👀 Watching {len(dirs)} local folders ({mode})")
+    watch = LocalFilesWatch(watcher, queue)
+    for root in watch.uncovered:
+        print(f"⚠️  {root} is missing or a network drive: kept on scheduled rescans")
+    return watch.start()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    watch = watch_local_files(os.path.join(os.path.dirname(os.path.realpath(__file__)), "content.db"))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        watch.stop()